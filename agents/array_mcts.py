@@ -0,0 +1,201 @@
+from agents.mcts import MCTSAgent, QuoridorMCTSAgent, _simulate
+from typing import Any, Tuple
+import numpy as np
+import random
+import time
+
+
+class ArrayTree:
+    # MCTS tree stored as a struct of arrays. Node i has statistics U[i] and N[i],
+    # its parent index and the id of the action leading to it; the children of a
+    # node are stored contiguously from first_child[i] to first_child[i] + num_children[i].
+    # States are only built when a node is first selected.
+    def __init__(self, state: Any, capacity: int = 1024) -> None:
+        self.size = 1
+        self.U = np.zeros(capacity, dtype=np.float64)
+        self.N = np.zeros(capacity, dtype=np.float64)
+        self.parent = np.full(capacity, -1, dtype=np.int64)
+        self.first_child = np.full(capacity, -1, dtype=np.int64)
+        self.num_children = np.zeros(capacity, dtype=np.int32)
+        self.action = np.full(capacity, -1, dtype=np.int64)
+        self.states = [state] + [None] * (capacity - 1)
+
+        # Action ids, shared by every node playing the same action
+        self.actions = []
+        self._action_ids = {}
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self.U)
+        while capacity < needed:
+            capacity *= 2
+        if capacity == len(self.U):
+            return
+        extra = capacity - len(self.U)
+        self.U = np.concatenate([self.U, np.zeros(extra, dtype=np.float64)])
+        self.N = np.concatenate([self.N, np.zeros(extra, dtype=np.float64)])
+        self.parent = np.concatenate([self.parent, np.full(extra, -1, dtype=np.int64)])
+        self.first_child = np.concatenate([self.first_child, np.full(extra, -1, dtype=np.int64)])
+        self.num_children = np.concatenate([self.num_children, np.zeros(extra, dtype=np.int32)])
+        self.action = np.concatenate([self.action, np.full(extra, -1, dtype=np.int64)])
+        self.states.extend([None] * extra)
+
+    def add_children(self, node: int, actions: list[Any]) -> None:
+        k = len(actions)
+        start = self.size
+        self._grow(start + k)
+        ids = []
+        for action in actions:
+            if action not in self._action_ids:
+                self._action_ids[action] = len(self.actions)
+                self.actions.append(action)
+            ids.append(self._action_ids[action])
+        self.parent[start:start + k] = node
+        self.action[start:start + k] = ids
+        self.first_child[node] = start
+        self.num_children[node] = k
+        self.size += k
+
+    def children(self, node: int) -> range:
+        start = self.first_child[node]
+        return range(start, start + self.num_children[node])
+
+    def best_child(self, node: int, c: float = 1.4) -> int:
+        # UCB1 over all children at once, unvisited children first in generation order
+        start = self.first_child[node]
+        end = start + self.num_children[node]
+        N = self.N[start:end]
+        unvisited = np.flatnonzero(N == 0)
+        if len(unvisited) > 0:
+            return start + unvisited[0]
+        return start + np.argmax(self.U[start:end] / N + c * np.sqrt(np.log(self.N[node]) / N))
+
+    def select(self, node: int = 0) -> int:
+        while self.num_children[node] > 0:
+            node = self.best_child(node)
+        return node
+
+    def backprop(self, r: float, node: int) -> None:
+        while node != -1:
+            self.U[node] += r
+            self.N[node] += 1
+            node = self.parent[node]
+            r = -r
+
+    def add_virtual_loss(self, node: int, loss: float) -> None:
+        # Counts a lost visit on the path to node until remove_virtual_loss, like VirtualLossSearch
+        while node != -1:
+            self.U[node] -= loss
+            self.N[node] += 1
+            node = self.parent[node]
+
+    def remove_virtual_loss(self, node: int, loss: float) -> None:
+        while node != -1:
+            self.U[node] += loss
+            self.N[node] -= 1
+            node = self.parent[node]
+
+    def nbytes(self) -> int:
+        # Bytes held by the statistic buffers, excluding states
+        return self.U.nbytes + self.N.nbytes + self.parent.nbytes + self.first_child.nbytes + self.num_children.nbytes + self.action.nbytes
+
+
+class ArrayMCTSAgent(MCTSAgent):
+    # MCTSAgent on an ArrayTree instead of linked Node objects. A leaf gets all its children at
+    # once, where the Node tree adds one per rollout, so the trees grow differently and the moves
+    # chosen can differ from MCTSAgent's under the same seed.
+    def __init__(self, game: Any, *args, **kwargs) -> None:
+        super().__init__(game, *args, **kwargs)
+        # Re-rooting would mean compacting the arrays, so every move starts from a fresh tree
+        self.reuse_tree = False
+
+    def state(self, tree: ArrayTree, node: int) -> Any:
+        if tree.states[node] is None:
+            parent = tree.parent[node]
+            tree.states[node] = self.game.successor(self.state(tree, parent), tree.actions[tree.action[node]])
+        return tree.states[node]
+
+    def select(self, tree: ArrayTree) -> int:
+        return tree.select(0)
+
+    def expand(self, tree: ArrayTree, node: int) -> int:
+        state = self.state(tree, node)
+        if tree.num_children[node] == 0 and not self.game.is_end(state):
+            tree.add_children(node, self.game.actions(state))
+        return tree.select(node)
+
+    def backprop(self, tree: ArrayTree, r: float, node: int) -> None:
+        tree.backprop(r, node)
+
+    def search(self, state: Any, rollouts: int, tree: ArrayTree = None) -> ArrayTree:
+        tree = tree if tree is not None else ArrayTree(state)
+        if self.parallel == 'leaf':
+            self._start_pool()
+        self._start_budget(rollouts)
+
+        batched = self.batch and self.parallel != 'leaf'
+        timings = self._timings
+        clock = time.perf_counter
+        while not self._stop(tree):
+            if batched:
+                self._search_batch(tree)
+                continue
+            t0 = clock()
+            leaf = self.select(tree)
+            t1 = clock()
+            child = self.expand(tree, leaf)
+            t2 = clock()
+            if self.parallel == 'leaf':
+                seeds = [random.getrandbits(32) for _ in range(self.workers)]
+                results = list(self._pool.map(_simulate, [self.state(tree, child)] * self.workers, seeds))
+            else:
+                results = [self.simulate(self.state(tree, child))]
+            t3 = clock()
+            for result in results:
+                self.backprop(tree, result, child)
+            t4 = clock()
+            timings['select'] += t1 - t0
+            timings['expand'] += t2 - t1
+            timings['simulate'] += t3 - t2
+            timings['backprop'] += t4 - t3
+            self._done += len(results)
+
+        self.stats = self._search_stats(tree)
+        return tree
+
+    def _search_batch(self, tree: ArrayTree) -> None:
+        # MCTSAgent._search_batch on the arrays: every selected leaf holds a virtual loss until the
+        # playouts of the batch are backed up
+        timings = self._timings
+        clock = time.perf_counter
+        count = self.batch if self._deadline else min(self.batch, self._rollouts - self._done)
+        leaves = []
+        for _ in range(count):
+            t0 = clock()
+            leaf = self.select(tree)
+            t1 = clock()
+            child = self.expand(tree, leaf)
+            timings['select'] += t1 - t0
+            timings['expand'] += clock() - t1
+            if child in leaves:
+                break
+            tree.add_virtual_loss(child, self.virtual_loss)
+            leaves.append(child)
+        t0 = clock()
+        results = self.simulate_batch([self.state(tree, child) for child in leaves])
+        t1 = clock()
+        for child, result in zip(leaves, results):
+            tree.remove_virtual_loss(child, self.virtual_loss)
+            self.backprop(tree, result, child)
+        timings['simulate'] += t1 - t0
+        timings['backprop'] += clock() - t1
+        self._done += len(results)
+
+    def tree_size(self, tree: ArrayTree) -> int:
+        return tree.size
+
+    def root_visits(self, tree: ArrayTree) -> list[Tuple[Any, float]]:
+        return [(tree.actions[tree.action[child]], float(tree.N[child])) for child in tree.children(0)]
+
+
+class QuoridorArrayMCTSAgent(ArrayMCTSAgent, QuoridorMCTSAgent):
+    pass
@@ -5,6 +5,13 @@ from collections import defaultdict
 import math
 import random
 from agents.utils import evaluate_state
+from games.batch import BatchQuoridor
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import multiprocessing
+import threading
+import time
         
 
 class Node:
@@ -14,15 +21,97 @@ class Node:
         self.U = U
         self.N = N
         self.children = {}
+        self.untried = None # Actions without a child yet, None until the node is first expanded
 
 
 def ucb1(n: Node, c: float = 1.4) -> float:
     if n.N > 0:
         return n.U / n.N + c * math.sqrt(math.log(n.parent.N) / n.N)
     return float('inf')
+
+
+class MCTSSearch:
+    # Selection, expansion and backup over a tree of Nodes without recursion. The
+    # selected path is recorded in a preallocated list, so backup walks it in
+    # reverse instead of following parent links. One object serves every
+    # iteration of a search.
+    # Children are created lazily, one per expansion, in the order the game lists
+    # the actions. With progressive widening, a node only takes another child while
+    # it has fewer than widening * N ** widening_exponent of them.
+    def __init__(self, agent: Any, root: Node, capacity: int = 64) -> None:
+        self.agent = agent
+        self.root = root
+        self.path = [None] * capacity
+        self.length = 0
+
+    def _push(self, n: Node) -> None:
+        if self.length == len(self.path):
+            self.path.extend([None] * len(self.path))
+        self.path[self.length] = n
+        self.length += 1
+
+    def best_child(self, n: Node, c: float = 1.4) -> Node:
+        # Same choice as max(n.children, key=ucb1), with the parent's log visit count computed once
+        log_N = math.log(n.N) if n.N > 0 else 0
+        sqrt = math.sqrt
+        best, best_value = None, float('-inf')
+        for child in n.children:
+            N = child.N
+            if N == 0:
+                return child
+            value = child.U / N + c * sqrt(log_N / N)
+            if value > best_value:
+                best, best_value = child, value
+        return best
+
+    def select(self) -> Node:
+        best_child = self.best_child
+        path = self.path
+        n = self.root
+        path[0] = n
+        length = 1
+        while n.children and not (n.untried and self._widen(n)):
+            n = best_child(n)
+            if length == len(path):
+                path.extend([None] * length)
+            path[length] = n
+            length += 1
+        self.length = length
+        return n
+
+    def _widen(self, n: Node) -> bool:
+        widening = self.agent.widening
+        return widening is None or len(n.children) < widening * max(n.N, 1) ** self.agent.widening_exponent
+
+    def _untried(self, n: Node) -> list[Any]:
+        # Reversed, so popping from the end creates children in the order the game lists the actions
+        game = self.agent.game
+        return [] if game.is_end(n.state) else game.actions(n.state)[::-1]
+
+    def expand(self, n: Node) -> Node:
+        if n.untried is None:
+            n.untried = self._untried(n)
+        if n.untried and self._widen(n):
+            action = n.untried.pop()
+            child = Node(state=self.agent.game.successor(n.state, action), parent=n)
+            n.children[child] = action
+            n = child
+            self._push(n)
+        return n
+
+    def backprop(self, r: float) -> None:
+        # Back up from the last selected node to the root, flipping the sign at every ply
+        path = self.path
+        for i in range(self.length - 1, -1, -1):
+            n = path[i]
+            n.U += r
+            n.N += 1
+            r = -r
         
 
 class MCTSAgent:
+    virtual_loss = 1 # Taken by every node on the path to a leaf of a batch until its playout is backed up
+
     def __init__(self, 
                  game: Any, 
                  name: str = 'MCTSAgent', 
@@ -30,61 +119,252 @@ class MCTSAgent:
                  rollouts: int = 100, 
                  depth: int = 60, 
                  policy: str = None, 
+                 parallel: str = None, 
+                 workers: int = None, 
+                 reuse_tree: bool = True, 
+                 time_limit: float = None, 
+                 early_stop: bool = False, 
+                 widening: float = None, 
+                 widening_exponent: float = 0.5, 
+                 batch: int = None, 
                  *args, **kwargs) -> None:
         self.game = game
         self.name = name
         self.rollouts = rollouts
+        self.time_limit = time_limit # With a time limit, rollouts run until the limit instead of a fixed number
+        self.early_stop = early_stop # Stop once the most visited root move can no longer be overtaken
+        self.widening = widening # Progressive widening, see MCTSSearch
+        self.widening_exponent = widening_exponent
+        self.batch = batch # Distinct leaves selected per iteration, their playouts run together by simulate_batch
         self.depth = depth if depth else 75
         self.player = player
         self._policy = policy if policy else 'random'
 
-    def action(self, state: Any):
+        # Parallel modes:
+        #   'root': each worker grows its own tree from the root and the root visit counts are summed
+        #   'leaf': every selected leaf is simulated once per worker, in parallel
+        if parallel not in [None, 'root', 'leaf']:
+            raise ValueError('Please enter valid parallel mode for MCTS agent.')
+        self.parallel = parallel
+        self.workers = workers if workers else multiprocessing.cpu_count()
+        self._pool = None
 
-        def select(n: Node) -> Node:
-            if n.children:
-                return select(max(n.children.keys(), key=ucb1))
-            return n
-
-        def expand(n: Node) -> Node:
-            if not n.children and not self.game.is_end(n.state):
-                n.children = {
-                    Node(state=self.game.successor(n.state, action), parent=n): action 
-                    for action in self.game.actions(n.state)
-                }
-            return select(n)
-
-        def simulate(s: Any) -> float:
-            player = self.game.player(s)
-            d = 0
-            while not self.game.is_end(s) and d < self.depth:
-                d += 1
-                action = self.policy(s)
-                s = self.game.successor(s, action)
-
-            if self.game.is_end(s):
-                value = self.game.utility(s, player)
-            elif d == self.depth:
-                value = self.evaluate(s, player)
-
-            value *= (self.depth - d + 1) / self.depth # Winning quickly is better
-            return -value
-
-        def backprop(r: float, n: Node):
-            n.U += r
-            n.N += 1
-            if n.parent:
-                backprop(-r, n.parent)
+        # Tree reuse: the subtree below our last move is kept, and the opponent's reply picks the next root
+        self.reuse_tree = reuse_tree
+        self._tree = None
+        self.tree_hits = 0
+        self.tree_misses = 0
+        self.reused_visits = 0
+        self.stats = {}
+
+    def __getstate__(self) -> dict:
+        # The pool stays in the parent process
+        state = self.__dict__.copy()
+        state['_pool'] = None
+        state['_tree'] = None
+        return state
+
+    def _start_pool(self) -> None:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, 
+                initializer=_init_worker, 
+                initargs=(self,)
+            )
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _lock(self, n: Node) -> contextlib.nullcontext:
+        # A single thread selects the leaves of a batch, so nodes need no locks
+        return _unlocked
 
-        tree = Node(state=state)
-        for _ in range(self.rollouts):
-            leaf = select(tree)
-            child = expand(leaf)
-            result = simulate(child.state)
-            backprop(result, child)
+    def searcher(self, tree: Node) -> MCTSSearch:
+        return MCTSSearch(self, tree)
 
-        action = tree.children[max(tree.children.keys(), key=lambda n: n.N)]
+    def search(self, state: Any, rollouts: int, tree: Node = None) -> Node:
+        tree = tree if tree is not None else Node(state=state)
+        if self.parallel == 'leaf':
+            self._start_pool()
+        self._start_budget(rollouts)
+
+        searcher = self.searcher(tree)
+        batched = self.batch and self.parallel != 'leaf'
+        searchers = [VirtualLossSearch(self, tree) for _ in range(self.batch)] if batched else None
+        timings = self._timings
+        clock = time.perf_counter
+        while not self._stop(tree):
+            if batched:
+                self._search_batch(searchers)
+                continue
+            t0 = clock()
+            leaf = searcher.select()
+            t1 = clock()
+            child = searcher.expand(leaf)
+            t2 = clock()
+            if self.parallel == 'leaf':
+                # Simulate the selected leaf once per worker
+                seeds = [random.getrandbits(32) for _ in range(self.workers)]
+                results = list(self._pool.map(_simulate, [child.state] * self.workers, seeds))
+            else:
+                results = [self.simulate(child.state)]
+            t3 = clock()
+            for result in results:
+                searcher.backprop(result)
+            t4 = clock()
+            timings['select'] += t1 - t0
+            timings['expand'] += t2 - t1
+            timings['simulate'] += t3 - t2
+            timings['backprop'] += t4 - t3
+            self._done += len(results)
+
+        self.stats = self._search_stats(tree)
+        return tree
+
+    def _search_batch(self, searchers: list[Any]) -> None:
+        # One iteration of a batched search: leaves are selected one after the other, each path holding a
+        # virtual loss that steers the next selection elsewhere, and their playouts run in one simulate_batch
+        # call. The batch ends early when a selection reaches a leaf that is already in it.
+        timings = self._timings
+        clock = time.perf_counter
+        count = self.batch if self._deadline else min(self.batch, self._rollouts - self._done)
+        leaves = []
+        for searcher in searchers[:count]:
+            t0 = clock()
+            leaf = searcher.select()
+            t1 = clock()
+            child = searcher.expand(leaf)
+            timings['select'] += t1 - t0
+            timings['expand'] += clock() - t1
+            if any(child is other for other in leaves):
+                searcher.cancel()
+                break
+            leaves.append(child)
+        t0 = clock()
+        results = self.simulate_batch([child.state for child in leaves])
+        t1 = clock()
+        for searcher, result in zip(searchers, results):
+            searcher.backprop(result)
+        timings['simulate'] += t1 - t0
+        timings['backprop'] += clock() - t1
+        self._done += len(results)
+
+    def _start_budget(self, rollouts: int) -> None:
+        self._start = time.perf_counter()
+        self._deadline = self._start + self.time_limit if self.time_limit else None
+        self._rollouts = rollouts
+        self._done = 0
+        self._next_check = 0
+        self._timings = {'select': 0.0, 'expand': 0.0, 'simulate': 0.0, 'backprop': 0.0}
+
+    def _stop(self, tree: Any) -> bool:
+        done = self._done
+        if self._deadline:
+            now = time.perf_counter()
+            if now >= self._deadline:
+                return True
+            # Rollouts that still fit in the time left at the rate so far
+            remaining = (self._deadline - now) * done / (now - self._start) if done else float('inf')
+        else:
+            if done >= self._rollouts:
+                return True
+            remaining = self._rollouts - done
+
+        # Every few rollouts, stop if the runner-up cannot catch up with the most visited root move.
+        # With a rollout budget this never changes the move. With a time limit the rollouts left are
+        # extrapolated from the rate so far, so a slower end of the search could have changed it.
+        if self.early_stop and done >= self._next_check:
+            self._next_check = done + 10
+            visits = sorted((N for _, N in self.root_visits(tree)), reverse=True)
+            if len(visits) == 1 or (len(visits) > 1 and visits[0] - visits[1] > remaining):
+                return True
+        return False
+
+    def _search_stats(self, tree: Any) -> dict:
+        return {
+            'rollouts': self._done, 
+            'tree_size': self.tree_size(tree), 
+            'time': time.perf_counter() - self._start, 
+            **self._timings
+        }
+
+    def tree_size(self, tree: Node) -> int:
+        size = 0
+        nodes = [tree]
+        while nodes:
+            n = nodes.pop()
+            size += 1
+            nodes.extend(n.children)
+        return size
+
+    def simulate(self, s: Any) -> float:
+        player = self.game.player(s)
+        s, d = self.playout(s)
+
+        if self.game.is_end(s):
+            value = self.game.utility(s, player)
+        elif d == self.depth:
+            value = self.evaluate(s, player)
+
+        value *= (self.depth - d + 1) / self.depth # Winning quickly is better
+        return -value
+
+    def action(self, state: Any):
+
+        if self.parallel == 'root':
+            # Split the rollouts over independent trees and sum their root visit counts
+            self._start_pool()
+            rollouts = [self.rollouts // self.workers + (1 if i < self.rollouts % self.workers else 0) for i in range(self.workers)]
+            seeds = [random.getrandbits(32) for _ in range(self.workers)]
+            visits = defaultdict(int)
+            for children in self._pool.map(_search_root, [state] * self.workers, rollouts, seeds):
+                for action, N in children:
+                    visits[action] += N
+            self.stats = {'rollouts': sum(visits.values()), 'workers': self.workers}
+            return max(visits.keys(), key=lambda action: visits[action])
+
+        root = self.reuse(state)
+        reused_visits = root.N if root is not None else 0
+        tree = self.search(state, self.rollouts, root)
+        action, _ = max(self.root_visits(tree), key=lambda visit: visit[1])
+        if self.reuse_tree:
+            self._tree = next((child for child, child_action in tree.children.items() if child_action == action), None)
+        self.stats.update(reused_visits=reused_visits, tree_hits=self.tree_hits, tree_misses=self.tree_misses)
         return action
 
+    def reuse(self, state: Any) -> Node | None:
+        # Detach the grandchild of the last root that matches state, the rest of the old tree is dropped
+        if not self.reuse_tree:
+            return None
+        last, self._tree = self._tree, None
+        if last is not None:
+            for child in last.children:
+                if child.state == state:
+                    child.parent = None
+                    self.tree_hits += 1
+                    self.reused_visits += child.N
+                    return child
+        self.tree_misses += 1
+        return None
+
+    def root_visits(self, tree: Node) -> list[Tuple[Any, float]]:
+        # Actions without a child yet count as unvisited
+        visits = [(action, child.N) for child, action in tree.children.items()]
+        return visits + [(action, 0) for action in reversed(tree.untried or [])]
+
+    def simulate_batch(self, states: list[Any]) -> list[float]:
+        return [self.simulate(s) for s in states]
+
+    def playout(self, s: Any) -> Tuple[Any, int]:
+        d = 0
+        while not self.game.is_end(s) and d < self.depth:
+            d += 1
+            action = self.policy(s)
+            s = self.game.successor(s, action)
+        return s, d
+
     def policy(self, state: Any) -> Any:
         return random.choice(self.game.actions(state))
     
@@ -93,24 +373,35 @@ class MCTSAgent:
     
 
 class QuoridorMCTSAgent(MCTSAgent):
+    # Playouts draw single actions with Quoridor.random_action, so no policy generates the full list of legal walls
+    weights = [0.5, 0.5, 0.1, 0.1, 0.05, 0.05]
+    _batch_game = None
+
+    def simulate_batch(self, states: list[Any]) -> list[float]:
+        # All playouts advance together on BatchQuoridor, whose evaluation uses pawn-free path lengths
+        if self._batch_game is None:
+            self._batch_game = BatchQuoridor(self.game)
+        rng = np.random.default_rng(random.getrandbits(32))
+        return self._batch_game.simulate(states, self.depth, self._policy, self.weights, rng).tolist()
+
+    def playout(self, s: Any) -> Tuple[Any, int]:
+        return self.game.playout(s, self.depth, self.policy)
+
     def policy(self, state: Any) -> Tuple[str, Tuple[int, int]]:
 
         def _random(state: Any) -> Tuple[str, Tuple[int, int]]:
-            return random.choice(self.game.actions(state))
+            return self.game.random_action(state)
         
         def _random_pmove(state: Any) -> Tuple[str, Tuple[int, int]]:
-            return random.choice([(move_type, move) for (move_type, move) in self.game.actions(state) if move_type=='pawn'])
+            return self.game.random_action(state, walls=False)
         
         def _forward_or_random(state: Any) -> Tuple[str, Tuple[int, int]]:
-            direction = (0, 1) if state.player == 1 else (0, -1)
-            moves = self.game.actions(state)
-            return ('pawn', direction) if ('pawn', direction) in moves else random.choice(moves)
+            forward = ('pawn', (0, 1) if state.player == 1 else (0, -1))
+            return forward if self.game.is_legal(state, forward) else self.game.random_action(state)
         
         def _forward_or_random_pmove(state: Any) -> Tuple[str, Tuple[int, int]]:
-            direction = (0, 1) if state.player == 1 else (0, -1)
-            moves = self.game.actions(state)
-            return ('pawn', direction) if ('pawn', direction) in moves\
-                else random.choice([(move_type, move) for (move_type, move) in self.game.actions(state) if move_type=='pawn'])
+            forward = ('pawn', (0, 1) if state.player == 1 else (0, -1))
+            return forward if self.game.is_legal(state, forward) else self.game.random_action(state, walls=False)
         
         if self._policy == 'random': 
             return _random(state)
@@ -124,4 +415,167 @@ class QuoridorMCTSAgent(MCTSAgent):
             raise ValueError('Please enter valid policy for MCTS agent.')
         
     def evaluate(self, state: Any, player: int | str) -> float:
-        return evaluate_state(self.game, state, player, [0.5, 0.5, 0.1, 0.1, 0.05, 0.05])
\ No newline at end of file
+        return evaluate_state(self.game, state, player, self.weights)
+
+
+class VirtualLossSearch(MCTSSearch):
+    # MCTSSearch for one thread of TreeParallelMCTSAgent or one leaf of a batch, every node is visited
+    # under its lock stripe
+    def _visit(self, n: Node) -> None:
+        with self.agent._lock(n):
+            n.N += 1
+            n.U -= self.agent.virtual_loss
+        self._push(n)
+
+    def select(self) -> Node:
+        self.length = 0
+        n = self.root
+        self._visit(n)
+        while n.children and not (n.untried and self._widen(n)):
+            n = self.best_child(n)
+            self._visit(n)
+        return n
+
+    def expand(self, n: Node) -> Node:
+        # Other threads may be choosing among the children, so the dict is replaced instead of updated
+        child = None
+        with self.agent._lock(n):
+            if n.untried is None:
+                n.untried = self._untried(n)
+            if n.untried and self._widen(n):
+                action = n.untried.pop()
+                child = Node(state=self.agent.game.successor(n.state, action), parent=n)
+                n.children = {**n.children, child: action}
+        # Another thread may have taken the last untried action, then the leaf descends into an existing child
+        if child is None and n.children:
+            child = self.best_child(n)
+        if child is not None:
+            self._visit(child)
+            n = child
+        return n
+
+    def backprop(self, r: float) -> None:
+        # The visit was counted when the virtual loss was applied, only the loss is undone
+        loss = self.agent.virtual_loss
+        path = self.path
+        for i in range(self.length - 1, -1, -1):
+            n = path[i]
+            with self.agent._lock(n):
+                n.U += r + loss
+            r = -r
+
+    def cancel(self) -> None:
+        # Takes back the visits and virtual losses of the selected path without a playout
+        loss = self.agent.virtual_loss
+        path = self.path
+        for i in range(self.length):
+            n = path[i]
+            with self.agent._lock(n):
+                n.N -= 1
+                n.U += loss
+
+
+class TreeParallelMCTSAgent(MCTSAgent):
+    # Several threads grow one shared tree. Every node on a selected path takes a
+    # virtual loss (one extra visit counted as a loss) until the playout result is
+    # backed up, which steers concurrent selections towards different paths.
+    # Statistics are updated under striped locks, so threads only contend when
+    # they touch nodes that hash to the same stripe.
+    def __init__(self, 
+                 game: Any, 
+                 name: str = 'TreeParallelMCTSAgent', 
+                 workers: int = None, 
+                 virtual_loss: float = 1, 
+                 stripes: int = 64, 
+                 *args, **kwargs) -> None:
+        super().__init__(game, name=name, workers=workers, *args, **kwargs)
+        self.parallel = None
+        self.virtual_loss = virtual_loss
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def __getstate__(self) -> dict:
+        state = super().__getstate__()
+        state['_locks'] = len(self._locks)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        state['_locks'] = [threading.Lock() for _ in range(state['_locks'])]
+        self.__dict__.update(state)
+
+    def _lock(self, n: Node) -> threading.Lock:
+        # Node addresses are multiples of the allocation size, so they are scrambled before picking a stripe
+        return self._locks[((id(n) >> 4) * 0x9E3779B97F4A7C15 >> 40) % len(self._locks)]
+
+    def searcher(self, tree: Node) -> VirtualLossSearch:
+        return VirtualLossSearch(self, tree)
+
+    def search(self, state: Any, rollouts: int, tree: Node = None) -> Node:
+        tree = tree if tree is not None else Node(state=state)
+        self._start_budget(rollouts)
+        counter = threading.Lock()
+
+        def work():
+            searcher = self.searcher(tree)
+            timings = dict.fromkeys(self._timings, 0.0)
+            clock = time.perf_counter
+            while True:
+                with counter:
+                    if self._stop(tree):
+                        break
+                    self._done += 1
+                t0 = clock()
+                leaf = searcher.select()
+                t1 = clock()
+                child = searcher.expand(leaf)
+                t2 = clock()
+                result = self.simulate(child.state)
+                t3 = clock()
+                searcher.backprop(result)
+                t4 = clock()
+                timings['select'] += t1 - t0
+                timings['expand'] += t2 - t1
+                timings['simulate'] += t3 - t2
+                timings['backprop'] += t4 - t3
+
+            # Phase times are summed over all threads
+            with counter:
+                for phase, seconds in timings.items():
+                    self._timings[phase] += seconds
+
+        threads = [threading.Thread(target=work) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.stats = self._search_stats(tree)
+        return tree
+
+
+class QuoridorTreeParallelMCTSAgent(TreeParallelMCTSAgent, QuoridorMCTSAgent):
+    pass
+
+
+# Shared by every MCTSAgent searching without threads
+_unlocked = contextlib.nullcontext()
+
+
+# Per-process state of parallel MCTS workers
+_worker_agent = None
+
+
+def _init_worker(agent: MCTSAgent) -> None:
+    global _worker_agent
+    _worker_agent = agent
+    _worker_agent.parallel = None # Workers search serially
+
+
+def _simulate(state: Any, seed: int) -> float:
+    random.seed(seed)
+    return _worker_agent.simulate(state)
+
+
+def _search_root(state: Any, rollouts: int, seed: int) -> list[Tuple[Any, float]]:
+    # Grow an independent tree and report the visit count of every root move
+    random.seed(seed)
+    tree = _worker_agent.search(state, rollouts)
+    return _worker_agent.root_visits(tree)
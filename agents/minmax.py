@@ -1,61 +1,298 @@
 # Adapted from Liang's implementation of minmax: https://stanford-cs221.github.io/autumn2025-lectures
 from agents.base import Agent
 from typing import Any, Tuple
-from agents.utils import evaluate_state
+from collections import defaultdict
+from agents.utils import evaluate_state, distance_oracle
+from agents.transposition import TranspositionTable, EXACT, LOWER, UPPER
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+import time
     
 
+class SearchTimeout(Exception):
+    # Raised inside the search once the time budget for a move is spent
+    pass
+
+
 class AlphaBetaAgent(Agent):
     def __init__(self, 
                  game: Any, 
                  name: str = 'MinMaxAgent', 
                  player: int = 1, 
                  depth: int = 4, 
+                 time_limit: float = None, 
+                 ordering: bool = False, 
+                 tt_size: int = None, 
+                 tt_replacement: str = 'depth', 
                  *args, **kwargs) -> None:
         self.game = game
         self.name = name
         self.player = player
         self.depth = depth if depth else 2
 
-    def action(self, state: Any) -> Any:
+        # With a time limit, search deepens iteratively up to self.depth until the limit is hit
+        self.time_limit = time_limit
+        self.stats = {}
 
-        def V_alphabeta(s: Any, d: int, a: float = float('-inf'), b: float = float('inf')) -> Tuple[float, Any]:
-            # Check base cases:
-            if self.game.is_end(s):
-                return self.game.utility(s, self.player) * 100, None
-            if d == 0:
-                return self.eval(s, self.player), None
-            
-            # Recursive cases:
-            actions_and_successors = [(action, self.game.successor(s, action)) for action in self.game.actions(s)]
-
-            if s.player == self.player:
-                best_value, best_action = float('-inf'), None
-                for action, successor in actions_and_successors:
-                    value, _ = V_alphabeta(successor, d-1, a, b)
-                    if value > best_value:
-                        best_value, best_action = value, action
-                    a = max(a, best_value)
-                    if a >= b:
-                        break
-                return best_value, best_action
-            
-            if s.player != self.player:
-                worst_value, worst_action = float('inf'), None
-                for action, successor in actions_and_successors:
-                    value, _ = V_alphabeta(successor, d-1, a, b)
-                    if value < worst_value:
-                        worst_value, worst_action = value, action
-                    b = min(b, worst_value)
+        # Move ordering: principal variation and table moves first, then killer moves, then by history and action_priority
+        self.ordering = ordering
+        self.killers = defaultdict(list) # Up to two moves per ply that recently caused a cutoff
+        self.history = defaultdict(int) # Cutoffs caused by each (player, action), weighted by depth
+
+        # Optional transposition table, kept across calls to action()
+        self.tt = TranspositionTable(size=tt_size, replacement=tt_replacement) if tt_size else None
+        self._reset_search()
+
+    def V_alphabeta(self, s: Any, d: int, a: float = float('-inf'), b: float = float('inf'), key: int = None, ply: int = 0, on_pv: bool = True) -> Tuple[float, Any]:
+        if self._deadline and time.perf_counter() > self._deadline:
+            raise SearchTimeout()
+        lines = self._lines
+        lines[ply] = []
+        self._counters['nodes'] += 1
+
+        # Check base cases:
+        if self.game.is_end(s):
+            return self.game.utility(s, self.player) * 100, None
+        if d == 0:
+            self._counters['evals'] += 1
+            return self.eval(s, self.player), None
+        
+        # Probe the transposition table
+        a_orig, b_orig = a, b
+        tt_action = None
+        if self.tt:
+            entry = self.tt.lookup(key)
+            if entry:
+                _, entry_depth, entry_value, entry_bound, tt_action = entry
+                if entry_depth >= d:
+                    if entry_bound == EXACT:
+                        lines[ply] = [tt_action]
+                        return entry_value, tt_action
+                    if entry_bound == LOWER:
+                        a = max(a, entry_value)
+                    elif entry_bound == UPPER:
+                        b = min(b, entry_value)
                     if a >= b:
-                        break
-                return worst_value, worst_action            
+                        lines[ply] = [tt_action]
+                        return entry_value, tt_action
+
+        # Order actions, then search the stored best move and the previous iteration's principal variation first
+        actions = self.game.actions(s)
+        if self.ordering:
+            actions = self.order_actions(s, actions, ply)
+        pv_action = self._pv[ply] if on_pv and ply < len(self._pv) else None
+        for first_action in [tt_action, pv_action]:
+            if first_action is not None and first_action in actions:
+                actions.remove(first_action)
+                actions.insert(0, first_action)
+
+        # Recursive cases, successors are only built once their turn comes so cutoffs skip the rest:
+        maximizing = s.player == self.player
+        best_value, best_action = float('-inf') if maximizing else float('inf'), None
+        for action in actions:
+            successor = self.game.successor(s, action)
+            value, _ = self.V_alphabeta(successor, d-1, a, b, self.game.zobrist_update(key, s, action) if self.tt else None, ply+1, action == pv_action)
+            if (value > best_value) if maximizing else (value < best_value):
+                best_value, best_action = value, action
+                lines[ply] = [action] + lines[ply+1]
+                if ply == 0:
+                    self._root_best = action
+            if maximizing:
+                a = max(a, best_value)
+            else:
+                b = min(b, best_value)
+            if a >= b:
+                self._counters['cutoffs'] += 1
+                if self.ordering:
+                    self.record_cutoff(s, action, d, ply)
+                break
+
+        if self.tt:
+            bound = UPPER if best_value <= a_orig else LOWER if best_value >= b_orig else EXACT
+            self.tt.store(key, d, best_value, bound, best_action)
+        return best_value, best_action
+
+    def _reset_search(self, deadline: float = None) -> None:
+        self._deadline = deadline
+        self._pv = [] # Principal variation of the previous iteration
+        self._lines = defaultdict(list) # Principal variation found below each ply in the current iteration
+        self._root_best = None # Best root move of the current iteration so far
+        self._counters = {'nodes': 0, 'cutoffs': 0, 'evals': 0}
+        self.killers.clear()
+        self.history.clear()
+
+    def search(self, state: Any, depth: int, a: float = float('-inf'), b: float = float('inf')) -> float:
+        # Value of state searched to a fixed depth within the window (a, b)
+        self._reset_search()
+        value, _ = self.V_alphabeta(state, depth, a, b, self.game.zobrist_hash(state) if self.tt else None)
+        self.stats = {'depth': depth, 'value': value, **self._counters}
+        return value
+
+    def action(self, state: Any) -> Any:
         
-        return V_alphabeta(state, self.depth)[1]
+        deadline = time.perf_counter() + self.time_limit if self.time_limit else None
+        self._reset_search(deadline)
+        
+        key = self.game.zobrist_hash(state) if self.tt else None
+        if not deadline:
+            value, best_action = self.V_alphabeta(state, self.depth, key=key)
+            self.stats = {'depth': self.depth, 'value': value, **self._counters}
+            return best_action
+
+        # Iterative deepening: keep the move of the deepest search that finished in time
+        best_action, self.stats = None, {'depth': 0}
+        for depth in range(1, self.depth + 1):
+            try:
+                value, action = self.V_alphabeta(state, depth, key=key)
+            except SearchTimeout:
+                break
+            best_action, self._pv = action, self._lines[0]
+            self.stats = {'depth': depth, 'value': value, **self._counters}
+            # A forced win or loss was found, deeper searches will not change the move
+            if abs(value) >= self.game.win_bonus * 100:
+                break
+
+        # Not even a depth 1 search finished, fall back to the best move seen so far
+        if best_action is None:
+            best_action = self._root_best if self._root_best is not None else self.game.actions(state)[0]
+        self.stats.update(self._counters)
+        return best_action
+
+    def order_actions(self, state: Any, actions: list[Any], ply: int) -> list[Any]:
+        # Stable sort, so actions that tie keep the order the game generated them in
+        killers = self.killers[ply]
+        history = self.history
+        player = state.player
+        return sorted(
+            actions, 
+            key=lambda action: (action in killers, history[(player, action)], self.action_priority(state, action)), 
+            reverse=True
+        )
+
+    def record_cutoff(self, state: Any, action: Any, depth: int, ply: int) -> None:
+        killers = self.killers[ply]
+        if action not in killers:
+            killers.insert(0, action)
+            del killers[2:]
+        self.history[(state.player, action)] += depth * depth
+
+    def action_priority(self, state: Any, action: Any) -> float:
+        # Game-specific ordering hint, higher is searched first
+        return 0
     
     def eval(self, state: Any, player: str | int) -> float:
         return 0
 
 
 class QuoridorAlphaBetaAgent(AlphaBetaAgent):
+    def order_actions(self, state: Any, actions: list[Any], ply: int) -> list[Any]:
+        # Distance maps only change with the walls, so the oracle serves most interior nodes from its cache
+        self._distances = distance_oracle.distance_maps(self.game, state)[state.player - 1]
+        return super().order_actions(state, actions, ply)
+
+    def action_priority(self, state: Any, action: Any) -> float:
+        # Pawn moves that shorten the mover's path to its goal row come first
+        move_type, move = action
+        if move_type != 'pawn':
+            return 0
+        pawn = state.p1 if state.player == 1 else state.p2
+        target = (pawn[0]+move[0], pawn[1]+move[1])
+        return self._distances.get(pawn, 0) - self._distances.get(target, 0)
+
     def eval(self, state: Any, player: str | int) -> float:
-        return evaluate_state(self.game, state, player, [0.5, 0.5, 0.1, 0.1, 0.05, 0.05])
\ No newline at end of file
+        return evaluate_state(self.game, state, player, [0.5, 0.5, 0.1, 0.1, 0.05, 0.05])
+
+
+# Per-process state of ParallelAlphaBetaAgent workers
+_worker_agent = None
+_worker_alpha = None
+
+
+def _init_worker(agent: AlphaBetaAgent, alpha: Any) -> None:
+    global _worker_agent, _worker_alpha
+    _worker_agent = agent
+    _worker_alpha = alpha
+
+
+def _search_root_move(index: int, successor: Any, depth: int) -> Tuple[int, float, float]:
+    # Search one root move with the best value found so far by any worker as alpha
+    alpha = _worker_alpha.value
+    value = _worker_agent.search(successor, depth, alpha, float('inf'))
+    if value > alpha:
+        with _worker_alpha.get_lock():
+            if value > _worker_alpha.value:
+                _worker_alpha.value = value
+    return index, value, alpha
+
+
+class ParallelAlphaBetaAgent(AlphaBetaAgent):
+    # Root-split alpha-beta: every root move is searched in a worker process with
+    # the best root value found so far as a shared alpha bound. Moves that fail low
+    # against that bound are only re-searched when they might tie for the best
+    # value, so the agent returns the same move as a serial search of the same depth.
+    def __init__(self, 
+                 game: Any, 
+                 name: str = 'ParallelMinMaxAgent', 
+                 player: int = 1, 
+                 depth: int = 4, 
+                 workers: int = None, 
+                 *args, **kwargs) -> None:
+        super().__init__(game, name=name, player=player, depth=depth, *args, **kwargs)
+        self.workers = workers if workers else multiprocessing.cpu_count()
+        self._pool = None
+        self._alpha = None
+
+    def __getstate__(self) -> dict:
+        # The pool and shared bound stay in the parent process
+        state = self.__dict__.copy()
+        state['_pool'] = None
+        state['_alpha'] = None
+        return state
+
+    def _start_pool(self) -> None:
+        if self._pool is None:
+            self._alpha = multiprocessing.Value('d', float('-inf'))
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, 
+                initializer=_init_worker, 
+                initargs=(self, self._alpha)
+            )
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def action(self, state: Any) -> Any:
+        # The root split only covers fixed-depth searches from our own turn
+        if self.time_limit or self.depth < 1 or state.player != self.player or self.game.is_end(state):
+            return super().action(state)
+        self._start_pool()
+        self._reset_search()
+
+        # Root moves in the order a serial search would try them
+        actions = self.game.actions(state)
+        if self.ordering:
+            actions = self.order_actions(state, actions, 0)
+        successors = [self.game.successor(state, action) for action in actions]
+
+        self._alpha.value = float('-inf')
+        futures = [self._pool.submit(_search_root_move, i, successor, self.depth-1) for i, successor in enumerate(successors)]
+        results = {}
+        for future in as_completed(futures):
+            i, value, alpha = future.result()
+            results[i] = (value, value > alpha) # Values at or below the worker's alpha are only upper bounds
+        best_value = max(value for value, exact in results.values() if exact)
+
+        # Serial alpha-beta keeps the first move reaching the best value
+        for i, action in enumerate(actions):
+            value, exact = results[i]
+            if not exact and value >= best_value:
+                value = self.search(successors[i], self.depth-1)
+            if value == best_value:
+                self.stats = {'depth': self.depth, 'value': best_value, 'workers': self.workers}
+                return action
+
+
+class QuoridorParallelAlphaBetaAgent(ParallelAlphaBetaAgent, QuoridorAlphaBetaAgent):
+    pass
@@ -0,0 +1,73 @@
+from typing import Any, Tuple
+
+
+# Bound types for stored values
+EXACT = 0
+LOWER = 1 # Search failed high, true value >= stored value
+UPPER = 2 # Search failed low, true value <= stored value
+
+
+class TranspositionTable:
+    # Fixed-size table of search results indexed by Zobrist key. Each slot holds
+    # (key, depth, value, bound, action); when two keys collide on a slot the
+    # replacement policy decides which entry survives:
+    #   'always': the newest entry replaces the old one
+    #   'depth':  the old entry is kept if it was searched deeper
+    def __init__(self, size: int = 2**18, replacement: str = 'depth') -> None:
+        if replacement not in ['always', 'depth']:
+            raise ValueError('Please enter valid replacement policy for transposition table.')
+        self.size = size
+        self.replacement = replacement
+        self.entries = [None] * size
+
+        # Counters
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.overwrites = 0
+        self.rejections = 0
+
+    def lookup(self, key: int) -> Tuple[int, int, float, int, Any] | None:
+        self.probes += 1
+        entry = self.entries[key % self.size]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key: int, depth: int, value: float, bound: int, action: Any) -> None:
+        index = key % self.size
+        entry = self.entries[index]
+        if entry is not None and entry[0] != key:
+            if self.replacement == 'depth' and entry[1] > depth:
+                self.rejections += 1
+                return
+            self.overwrites += 1
+        self.entries[index] = (key, depth, value, bound, action)
+        self.stores += 1
+
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes > 0 else 0
+
+    def filled(self) -> int:
+        return sum(1 for entry in self.entries if entry is not None)
+
+    def clear(self) -> None:
+        self.entries = [None] * self.size
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.overwrites = 0
+        self.rejections = 0
+
+    def stats(self) -> dict:
+        return {
+            'size': self.size,
+            'filled': self.filled(),
+            'probes': self.probes,
+            'hits': self.hits,
+            'hit_rate': self.hit_rate(),
+            'stores': self.stores,
+            'overwrites': self.overwrites,
+            'rejections': self.rejections
+        }
@@ -1,74 +1,66 @@
 from typing import Any, Tuple
-from heapq import heappush, heappop
-from games.quoridor import State
+from collections import OrderedDict
+import threading
+
+
+class DistanceOracle:
+    # Goal distances of both players from every square, found by one reverse BFS per player from
+    # its goal row. Distances do not depend on where the pawns stand, so the maps are cached per
+    # wall configuration in a LRU of at most capacity entries and shared by every pawn position.
+    def __init__(self, capacity: int = 2**12) -> None:
+        self.capacity = capacity
+        self.maps = OrderedDict()
+        self._lock = threading.Lock() # Tree parallel MCTS evaluates from several threads
+
+        # Counters
+        self.probes = 0
+        self.hits = 0
+
+    def distance_maps(self, game: Any, state: Any) -> Tuple[dict, dict]:
+        key = (game.size, state.h_walls, state.v_walls)
+        with self._lock:
+            self.probes += 1
+            maps = self.maps.get(key)
+            if maps is not None:
+                self.hits += 1
+                self.maps.move_to_end(key)
+                return maps
+        maps = (game.goal_distances(state, 1), game.goal_distances(state, 2))
+        with self._lock:
+            self.maps[key] = maps
+            if len(self.maps) > self.capacity:
+                self.maps.popitem(last=False)
+        return maps
+
+    def distances(self, game: Any, state: Any) -> Tuple[float, float]:
+        # Steps of player 1 and player 2 to their goal rows, inf if a player is cut off
+        p1_distances, p2_distances = self.distance_maps(game, state)
+        return p1_distances.get(state.p1, float('inf')), p2_distances.get(state.p2, float('inf'))
+
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes > 0 else 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self.maps.clear()
+            self.probes = 0
+            self.hits = 0
+
+
+# Shared by all agents of the process
+distance_oracle = DistanceOracle()
 
 
 def evaluate_state(game: Any, 
                    state: Any, 
                    player: str | int, 
-                   weights: list[float] = [0, 0, 0, 0, 0, 0]) -> float:
+                   weights: list[float] = [0, 0, 0, 0, 0, 0],
+                   oracle: DistanceOracle | None = None) -> float:
 
-    def _path_length(game: Any, 
-                     p1: Tuple[int, int], 
-                     p2: Tuple[int, int], 
-                     h_walls: list[Tuple[int, int]], 
-                     v_walls: list[Tuple[int, int]], 
-                     player: str | int) -> float:
-        
-        start = p1 if player == 1 else p2
-        goal = game.size - 1 if player == 1 else 0
-
-        def _astar(start: Tuple[int, int], goal: int, player: int) -> bool:
-
-            node = start
-
-            if node[1] == goal:
-                return 0
-
-            frontier = []
-            heappush(frontier, (0, node))
-            reached = [node]
-
-            while len(frontier) > 0:
-                g, node = heappop(frontier)
-
-                # Get children
-                state = State(
-                    p1=node if player==1 else p2,
-                    p2=node if player==2 else p1,
-                    p1_numwalls=0,
-                    p2_numwalls=0,
-                    player=player,
-                    h_walls=h_walls,
-                    v_walls=v_walls
-                )
-                actions = game.actions(state)
-                for action in actions:
-                    successor = game.successor(state, action)
-                    s = successor.p1 if player==1 else successor.p2
-
-                    if s[1] == goal:
-                        return g + 1
-
-                    if s not in reached:
-                        reached.append(s)
-                        h = _heuristic(s, goal)
-                        heappush(frontier, (g + 1 + h, s))
-                        
-            return float('inf')     
-
-        def _heuristic(start: Tuple[int, int], goal: int) -> int:
-            return abs(goal - start[1])
-
-        return _astar(start, goal, player)
-    
-    p1 = state.p1
-    p2 = state.p2
-    h_walls = state.h_walls
-    v_walls = state.v_walls
-
-    my_dist = _path_length(game, p1, p2, h_walls, v_walls, player)
-    opp_dist = _path_length(game, p1, p2, h_walls, v_walls, 2 if player==1 else 1)
+    # Path lengths to the goal rows ignore the pawns
+    p1_dist, p2_dist = (oracle or distance_oracle).distances(game, state)
+    my_dist = p1_dist if player==1 else p2_dist
+    opp_dist = p2_dist if player==1 else p1_dist
     my_walls = state.p1_numwalls if player==1 else state.p2_numwalls
     opp_walls = state.p2_numwalls if player==1 else state.p1_numwalls
     my_progress = state.p1[1] if player==1 else game.size - 1 - state.p2[1]
@@ -0,0 +1,109 @@
+from games.bitboard import BitboardQuoridor
+from agents.minmax import QuoridorAlphaBetaAgent, QuoridorParallelAlphaBetaAgent
+from typing import Any
+import argparse
+import random
+import time
+
+
+def positions(game: Any, count: int, moves: int, seed: int = 0) -> list[Any]:
+    # Fixed positions reached by random play from the start state
+    rng = random.Random(seed)
+    states = []
+    while len(states) < count:
+        state = game.start_state()
+        for _ in range(rng.randint(0, moves)):
+            state = game.successor(state, rng.choice(game.actions(state)))
+            if game.is_end(state):
+                break
+        if not game.is_end(state):
+            states.append(state)
+    return states
+
+
+def search(agent: Any, states: list[Any]) -> tuple[int, int, float]:
+    nodes, cutoffs = 0, 0
+    start = time.perf_counter()
+    for state in states:
+        agent.player = state.player
+        agent.action(state)
+        nodes += agent.stats['nodes']
+        cutoffs += agent.stats['cutoffs']
+    return nodes, cutoffs, time.perf_counter() - start
+
+
+def ordering(args: argparse.Namespace) -> None:
+    print(f'{"board":>6} {"depth":>6} {"ordering":>9} {"nodes":>10} {"cutoffs":>9} {"seconds":>9}')
+    for size, numwalls, depth in [(5, 5, args.depth), (9, 10, args.depth - 1)]:
+        game = BitboardQuoridor(size=size, numwalls=numwalls)
+        states = positions(game, args.positions, args.moves, args.seed)
+        for ordered in [False, True]:
+            agent = QuoridorAlphaBetaAgent(game=game, depth=depth, ordering=ordered)
+            nodes, cutoffs, seconds = search(agent, states)
+            print(f'{f"{size}x{size}":>6} {depth:>6} {str(ordered):>9} {nodes:>10} {cutoffs:>9} {seconds:>9.2f}')
+
+
+def scaling(args: argparse.Namespace) -> None:
+    print(f'{"board":>6} {"depth":>6} {"workers":>8} {"seconds":>9} {"speedup":>8} {"same move":>10}')
+    for size, numwalls, depth in [(5, 5, args.depth), (9, 10, args.depth - 1)]:
+        game = BitboardQuoridor(size=size, numwalls=numwalls)
+        states = positions(game, args.positions, args.moves, args.seed)
+
+        # Serial reference
+        serial_moves = []
+        start = time.perf_counter()
+        for state in states:
+            serial_moves.append(QuoridorAlphaBetaAgent(game=game, depth=depth, player=state.player).action(state))
+        serial_seconds = time.perf_counter() - start
+        print(f'{f"{size}x{size}":>6} {depth:>6} {"serial":>8} {serial_seconds:>9.2f} {1:>7.2f}x {"":>10}')
+
+        for workers in args.workers:
+            agents = {player: QuoridorParallelAlphaBetaAgent(game=game, depth=depth, player=player, workers=workers) for player in [1, 2]}
+            for agent in agents.values():
+                agent._start_pool() # Keep process startup out of the timings
+            moves = []
+            start = time.perf_counter()
+            for state in states:
+                moves.append(agents[state.player].action(state))
+            seconds = time.perf_counter() - start
+            for agent in agents.values():
+                agent.close()
+            print(f'{f"{size}x{size}":>6} {depth:>6} {workers:>8} {seconds:>9.2f} {serial_seconds / seconds:>7.2f}x {str(moves == serial_moves):>10}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--benchmark', type=str,
+                        help='Node counts with and without move ordering, or parallel scaling over worker counts.',
+                        choices=['ordering', 'scaling'],
+                        default='ordering'
+    )
+    parser.add_argument('--workers', type=int, nargs='+',
+                        help='Worker counts for the scaling benchmark.',
+                        default=[1, 2, 4, 8, 16]
+    )
+    parser.add_argument('--depth', type=int,
+                        help='Search depth on 5x5 boards, 9x9 boards are searched one ply shallower.',
+                        default=3
+    )
+    parser.add_argument('--positions', type=int,
+                        help='Number of fixed positions per board size.',
+                        default=5
+    )
+    parser.add_argument('--moves', type=int,
+                        help='Maximum number of random moves played to reach each position.',
+                        default=10
+    )
+    parser.add_argument('--seed', type=int,
+                        help='Seed used to generate the positions.',
+                        default=0
+    )
+    args = parser.parse_args()
+    if args.benchmark == 'ordering':
+        ordering(args)
+    elif args.benchmark == 'scaling':
+        scaling(args)
+
+
+if __name__ == '__main__':
+    main()
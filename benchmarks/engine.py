@@ -0,0 +1,43 @@
+from games.quoridor import Quoridor
+from games.bitboard import BitboardQuoridor
+from typing import Any
+import argparse
+import random
+import time
+
+
+def nodes_per_second(game: Any, seconds: float, seed: int = 0) -> float:
+    # Play random games and count how many states get their actions generated and a successor applied
+    rng = random.Random(seed)
+    nodes = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        state = game.start_state()
+        while not game.is_end(state) and time.perf_counter() - start < seconds:
+            action = rng.choice(game.actions(state))
+            state = game.successor(state, action)
+            nodes += 1
+    return nodes / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float,
+                        help='Time spent on each engine and board size.',
+                        default=5
+    )
+    parser.add_argument('--seed', type=int,
+                        help='Seed for the random playouts.',
+                        default=0
+    )
+    args = parser.parse_args()
+
+    print(f'{"board":>8} {"Quoridor":>14} {"BitboardQuoridor":>18} {"speedup":>9}')
+    for size, numwalls in [(5, 5), (9, 10)]:
+        base = nodes_per_second(Quoridor(size=size, numwalls=numwalls), args.seconds, args.seed)
+        fast = nodes_per_second(BitboardQuoridor(size=size, numwalls=numwalls), args.seconds, args.seed)
+        print(f'{f"{size}x{size}":>8} {base:>10.1f} n/s {fast:>14.1f} n/s {fast / base:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+from games.quoridor import Quoridor
+from games.bitboard import BitboardQuoridor
+from agents.utils import DistanceOracle
+from benchmarks.alphabeta import positions
+from typing import Any, Tuple
+from heapq import heappush, heappop
+from dataclasses import replace
+import argparse
+import time
+
+
+def astar_distance(game: Any, root: Any, player: int) -> float:
+    # Reference path length: A* over the pawn moves of game.actions, as evaluate_state used to search,
+    # with the opponent's pawn moved onto the start square. Unlike that search it keeps the cost so far
+    # apart from the heuristic, the old one added the heuristic to the cost on every step.
+    p1, p2 = root.p1, root.p2
+    start = p1 if player == 1 else p2
+    goal = game.size - 1 if player == 1 else 0
+    if start[1] == goal:
+        return 0
+
+    frontier = []
+    heappush(frontier, (0, 0, start))
+    reached = [start]
+    while len(frontier) > 0:
+        _, g, node = heappop(frontier)
+        state = replace(
+            root,
+            p1=node if player==1 else p2,
+            p2=node if player==2 else p1,
+            p1_numwalls=0,
+            p2_numwalls=0,
+            player=player
+        )
+        for action in game.actions(state):
+            successor = game.successor(state, action)
+            s = successor.p1 if player==1 else successor.p2
+            if s[1] == goal:
+                return g + 1
+            if s not in reached:
+                reached.append(s)
+                heappush(frontier, (g + 1 + abs(goal - s[1]), g + 1, s))
+    return float('inf')
+
+
+def evaluate(game: Any, states: list[Any], oracle: DistanceOracle) -> Tuple[bool, float, float, float]:
+    # Distances of both players in every state with the reference A* and with the oracle, and the time of each.
+    # The last time is a second pass of the oracle, served from its cache like positions repeated during a search.
+    start = time.perf_counter()
+    reference = [(astar_distance(game, state, 1), astar_distance(game, state, 2)) for state in states]
+    reference_time = time.perf_counter() - start
+    start = time.perf_counter()
+    distances = [oracle.distances(game, state) for state in states]
+    oracle_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for state in states:
+        oracle.distances(game, state)
+    return reference == distances, reference_time, oracle_time, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--positions', type=int,
+                        help='Number of random positions evaluated per board.',
+                        default=500
+    )
+    parser.add_argument('--moves', type=int,
+                        help='Maximum number of random moves played to reach each position.',
+                        default=40
+    )
+    parser.add_argument('--seed', type=int,
+                        help='Seed for the random positions.',
+                        default=0
+    )
+    args = parser.parse_args()
+
+    # Positions come in random order, so on the first pass the oracle only hits its cache on repeated wall configurations
+    print(f'{"board":>6} {"engine":>17} {"A* evals/s":>11} {"oracle evals/s":>15} {"speedup":>8} {"cached evals/s":>15} {"speedup":>8} {"same":>5}')
+    for size, numwalls in [(5, 5), (9, 10)]:
+        for game in [Quoridor(size=size, numwalls=numwalls), BitboardQuoridor(size=size, numwalls=numwalls)]:
+            states = positions(game, args.positions, args.moves, args.seed)
+            oracle = DistanceOracle()
+            same, reference_time, oracle_time, cached_time = evaluate(game, states, oracle)
+            print(f'{f"{size}x{size}":>6} {type(game).__name__:>17} {len(states) / reference_time:>11.1f} '
+                  f'{len(states) / oracle_time:>15.1f} {reference_time / oracle_time:>7.1f}x '
+                  f'{len(states) / cached_time:>15.1f} {reference_time / cached_time:>7.1f}x {str(same):>5}')
+
+
+if __name__ == '__main__':
+    main()
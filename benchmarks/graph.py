@@ -0,0 +1,125 @@
+from games.quoridor import Quoridor
+from benchmarks.alphabeta import positions
+from typing import Any, Callable, Tuple
+from heapq import heappush, heappop
+import argparse
+import time
+
+
+# Reference searches as Quoridor ran them before GridGraph: squares as (x, y) tuples,
+# visited squares kept in a list and A* ordered by a heap
+
+def square_adjacency(game: Any, state: Any) -> dict:
+    adjacency = game._adjacency(state)
+    return {game.graph.squares[cell]: tuple(game.graph.squares[s] for s in adjacency[cell]) for cell in range(len(adjacency))}
+
+
+def reference_astar(adjacency: dict, start: Tuple[int, int], goal: int) -> bool:
+    if start[1] == goal:
+        return True
+    frontier = []
+    heappush(frontier, (0, 0, start))
+    reached = [start]
+    while len(frontier) > 0:
+        _, g, node = heappop(frontier)
+        for s in adjacency[node]:
+            if s[1] == goal:
+                return True
+            if s not in reached:
+                reached.append(s)
+                heappush(frontier, (g + 1 + abs(goal - s[1]), g + 1, s))
+    return False
+
+
+def reference_path_length(adjacency: dict, start: Tuple[int, int], goal: int) -> int | None:
+    reached = [start]
+    frontier = [start]
+    d = 0
+    while len(frontier) > 0:
+        next_frontier = []
+        for node in frontier:
+            if node[1] == goal:
+                return d
+            for s in adjacency[node]:
+                if s not in reached:
+                    reached.append(s)
+                    next_frontier.append(s)
+        frontier = next_frontier
+        d += 1
+    return None
+
+
+def reference_distances(adjacency: dict, size: int, goal: int) -> dict:
+    frontier = [(x, goal) for x in range(size)]
+    reached = list(frontier)
+    distances = {node: 0 for node in frontier}
+    while len(frontier) > 0:
+        next_frontier = []
+        for node in frontier:
+            for s in adjacency[node]:
+                if s not in reached:
+                    reached.append(s)
+                    distances[s] = distances[node] + 1
+                    next_frontier.append(s)
+        frontier = next_frontier
+    return distances
+
+
+def timed(query: Callable, inputs: list[Any], repeats: int) -> Tuple[list[Any], float]:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        results = [query(*arguments) for arguments in inputs]
+    return results, (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int,
+                        help='Board size.',
+                        default=9
+    )
+    parser.add_argument('--positions', type=int,
+                        help='Number of random positions with walls to search on.',
+                        default=300
+    )
+    parser.add_argument('--moves', type=int,
+                        help='Maximum number of random moves played to reach each position.',
+                        default=60
+    )
+    parser.add_argument('--repeats', type=int,
+                        help='Times every query is repeated.',
+                        default=5
+    )
+    parser.add_argument('--seed', type=int,
+                        help='Seed for the random positions.',
+                        default=0
+    )
+    args = parser.parse_args()
+
+    game = Quoridor(size=args.size, numwalls=args.size + 1)
+    graph = game.graph
+    states = positions(game, args.positions, args.moves, args.seed)
+    pawns = [(state.p1, game.size - 1) for state in states] + [(state.p2, 0) for state in states]
+    squares = [square_adjacency(game, state) for state in states] * 2
+    cells = [game._adjacency(state) for state in states] * 2
+    goals = [goal for _, goal in pawns]
+
+    queries = [
+        ('path exists (A*)', reference_astar, graph.reaches_astar,
+         [(a, *p) for a, p in zip(squares, pawns)], [(a, *p) for a, p in zip(cells, pawns)], lambda r: r),
+        ('shortest path', reference_path_length, graph.shortest_path_edges,
+         [(a, *p) for a, p in zip(squares, pawns)], [(a, *p) for a, p in zip(cells, pawns)], lambda r: None if r is None else len(r)),
+        ('goal distances', lambda a, g: reference_distances(a, game.size, g), graph.distances,
+         list(zip(squares, goals)), list(zip(cells, goals)), lambda r: r),
+    ]
+    print(f'{f"{game.size}x{game.size}":<16} {"list + heap":>14} {"bytearray + buckets":>20} {"speedup":>8} {"same":>5}')
+    for name, reference, query, reference_inputs, inputs, result in queries:
+        expected, reference_time = timed(reference, reference_inputs, args.repeats)
+        results, query_time = timed(query, inputs, args.repeats)
+        same = [result(r) for r in results] == expected
+        print(f'{name:<16} {len(inputs) / reference_time:>10.0f} q/s {len(inputs) / query_time:>16.0f} q/s '
+              f'{reference_time / query_time:>7.1f}x {str(same):>5}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,336 @@
+from games.bitboard import BitboardQuoridor
+from agents.mcts import Node, MCTSSearch, QuoridorMCTSAgent, QuoridorTreeParallelMCTSAgent, ucb1
+from agents.array_mcts import ArrayTree
+from games.batch import BatchQuoridor
+import numpy as np
+from typing import Any, Tuple
+import argparse
+import random
+import time
+import tracemalloc
+
+
+def parallel(args: argparse.Namespace) -> None:
+    print(f'{"board":>6} {"mode":>7} {"workers":>8} {"rollouts/s":>11} {"speedup":>8}')
+    for size, numwalls in [(5, 5), (9, 10)]:
+        game = BitboardQuoridor(size=size, numwalls=numwalls)
+        state = game.start_state()
+        baseline = None
+        for mode in [None, 'root', 'leaf']:
+            for workers in ([1] if mode is None else args.workers):
+                random.seed(args.seed)
+                agent = QuoridorMCTSAgent(game=game, rollouts=args.rollouts, depth=args.depth, policy=args.policy, parallel=mode, workers=workers, early_stop=False)
+                if mode is not None:
+                    agent._start_pool() # Keep process startup out of the timings
+                start = time.perf_counter()
+                agent.action(state)
+                rate = args.rollouts / (time.perf_counter() - start)
+                agent.close()
+                baseline = baseline if baseline else rate
+                print(f'{f"{size}x{size}":>6} {str(mode):>7} {workers:>8} {rate:>11.1f} {rate / baseline:>7.2f}x')
+
+
+def rollout_rate(agent: Any, state: Any, rollouts: int) -> float:
+    start = time.perf_counter()
+    agent.search(state, rollouts)
+    return rollouts / (time.perf_counter() - start)
+
+
+def play(game: Any, agents: dict, max_moves: int = 200) -> int:
+    # Play one game between agents keyed by player number and return the winning player, 0 for a draw
+    state = game.start_state()
+    for _ in range(max_moves):
+        if game.is_end(state):
+            break
+        state = game.successor(state, agents[state.player].action(state))
+    return 1 if game.utility(state) == game.win_bonus else 2 if game.utility(state) == -game.win_bonus else 0
+
+
+def tree(args: argparse.Namespace) -> None:
+    # Both agents get the rollouts they manage in the same wall-clock budget per move
+    print(f'{"board":>6} {"workers":>8} {"serial r/s":>11} {"tree r/s":>9} {"serial wins":>12} {"tree wins":>10} {"draws":>6}')
+    for size, numwalls in [(5, 5), (9, 10)]:
+        game = BitboardQuoridor(size=size, numwalls=numwalls)
+        state = game.start_state()
+        random.seed(args.seed)
+        serial_rate = rollout_rate(QuoridorMCTSAgent(game=game, depth=args.depth, policy=args.policy, early_stop=False), state, args.rollouts)
+        for workers in args.workers:
+            tree_rate = rollout_rate(QuoridorTreeParallelMCTSAgent(game=game, depth=args.depth, policy=args.policy, workers=workers, early_stop=False), state, args.rollouts)
+            wins = {'serial': 0, 'tree': 0, 'draw': 0}
+            for i in range(args.games):
+                # Alternate colors between games
+                serial_player = 1 if i % 2 == 0 else 2
+                tree_player = 3 - serial_player
+                agents = {
+                    serial_player: QuoridorMCTSAgent(game=game, player=serial_player, depth=args.depth, policy=args.policy, 
+                                                     rollouts=max(1, int(serial_rate * args.budget))),
+                    tree_player: QuoridorTreeParallelMCTSAgent(game=game, player=tree_player, depth=args.depth, policy=args.policy, 
+                                                               rollouts=max(1, int(tree_rate * args.budget)), workers=workers)
+                }
+                winner = play(game, agents)
+                wins['serial' if winner == serial_player else 'tree' if winner == tree_player else 'draw'] += 1
+            print(f'{f"{size}x{size}":>6} {workers:>8} {serial_rate:>11.1f} {tree_rate:>9.1f} {wins["serial"]:>12} {wins["tree"]:>10} {wins["draw"]:>6}')
+
+
+def synthetic_trees(nodes: int, branching: int, seed: int = 0) -> Tuple[Node, ArrayTree, int, int]:
+    # The same random tree as linked Nodes and as an ArrayTree, every node visited at least once,
+    # with the bytes allocated for each
+    rng = random.Random(seed)
+    tracemalloc.start()
+    root = Node(state=None)
+    frontier, size = [root], 1
+    while size < nodes:
+        n = frontier.pop(0)
+        n.children = {Node(state=None, parent=n): i for i in range(branching)}
+        frontier.extend(n.children)
+        size += branching
+    object_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # Number the nodes breadth first, which is the order ArrayTree stores them in
+    order = [root]
+    for n in order:
+        order.extend(n.children)
+    index = {n: i for i, n in enumerate(order)}
+
+    tracemalloc.start()
+    tree = ArrayTree(state=None)
+    for n in order:
+        if n.children:
+            tree.add_children(index[n], list(n.children.values()))
+    array_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # Visit counts that add up from the leaves, utilities anywhere in [-N, N]
+    for n in reversed(order):
+        n.N = 1 + sum(child.N for child in n.children)
+        n.U = rng.uniform(-n.N, n.N)
+        tree.N[index[n]], tree.U[index[n]] = n.N, n.U
+    return root, tree, object_bytes, array_bytes
+
+
+def array(args: argparse.Namespace) -> None:
+    print(f'{"nodes":>8} {"branching":>10} {"store":>7} {"bytes/node":>11} {"selects/s":>10}')
+    for branching in args.branching:
+        root, tree, object_bytes, array_bytes = synthetic_trees(args.nodes, branching, args.seed)
+        searcher = MCTSSearch(None, root)
+        for store, select, memory in [('object', searcher.select, object_bytes), ('array', lambda: tree.select(0), array_bytes)]:
+            start = time.perf_counter()
+            for _ in range(args.selects):
+                select()
+            rate = args.selects / (time.perf_counter() - start)
+            print(f'{tree.size:>8} {branching:>10} {store:>7} {memory / tree.size:>11.1f} {rate:>10.1f}')
+
+
+def recursive_select(n: Node) -> Node:
+    # Selection and backup as MCTSAgent did them before MCTSSearch, kept for comparison
+    if n.children:
+        return recursive_select(max(n.children.keys(), key=ucb1))
+    return n
+
+
+def recursive_backprop(r: float, n: Node) -> None:
+    n.U += r
+    n.N += 1
+    if n.parent:
+        recursive_backprop(-r, n.parent)
+
+
+def line(depth: int) -> Node:
+    # A single line of play, which isolates the cost per ply
+    root = n = Node(state=None, N=depth+1)
+    for d in range(depth):
+        child = Node(state=None, parent=n, N=depth-d)
+        n.children = {child: 0}
+        n = child
+    return root
+
+
+def iterative(args: argparse.Namespace) -> None:
+    print(f'{"tree":>16} {"depth":>6} {"recursive us":>13} {"iterative us":>13} {"speedup":>8}')
+    trees = [('line', line(depth)) for depth in args.depths]
+    trees += [(f'{args.nodes}x{branching}', synthetic_trees(args.nodes, branching, args.seed)[0]) for branching in args.branching]
+    for name, root in trees:
+        searcher = MCTSSearch(None, root)
+        searcher.select()
+        depth = searcher.length - 1
+
+        # Select a leaf and back a result up from it, alternating wins and losses so the statistics stay put
+        def recursive(i: int) -> None:
+            recursive_backprop(1 if i % 2 else -1, recursive_select(root))
+
+        def iterative(i: int) -> None:
+            searcher.select()
+            searcher.backprop(1 if i % 2 else -1)
+
+        times = []
+        for run in [recursive, iterative]:
+            start = time.perf_counter()
+            try:
+                for i in range(args.selects):
+                    run(i)
+            except RecursionError:
+                times.append(None)
+                continue
+            times.append((time.perf_counter() - start) / args.selects * 1e6)
+        recursive_us = f'{times[0]:.2f}' if times[0] is not None else 'too deep'
+        speedup = f'{times[0] / times[1]:.2f}x' if times[0] is not None else '-'
+        print(f'{name:>16} {depth:>6} {recursive_us:>13} {times[1]:>13.2f} {speedup:>8}')
+
+
+class EagerSearch(MCTSSearch):
+    # Expansion as MCTSSearch did it before children were created lazily, kept for comparison
+    def expand(self, n: Node) -> Node:
+        game = self.agent.game
+        if not n.children and not game.is_end(n.state):
+            n.children = {
+                Node(state=game.successor(n.state, action), parent=n): action 
+                for action in game.actions(n.state)
+            }
+        if n.children:
+            n = self.best_child(n)
+            self._push(n)
+        return n
+
+
+class EagerMCTSAgent(QuoridorMCTSAgent):
+    def searcher(self, tree: Node) -> MCTSSearch:
+        return EagerSearch(self, tree)
+
+
+def expansion(args: argparse.Namespace) -> None:
+    # Every node but the root cost one successor call when it was expanded
+    print(f'{"board":>6} {"expansion":>10} {"s/1k":>7} {"successors/1k":>14} {"KiB/1k":>8} {"same move":>10}')
+    for size, numwalls in [(5, 5), (9, 10)]:
+        game = BitboardQuoridor(size=size, numwalls=numwalls)
+        state = game.start_state()
+        configs = [('eager', EagerMCTSAgent, {}), ('lazy', QuoridorMCTSAgent, {})]
+        configs += [(f'widen {widening:g}', QuoridorMCTSAgent, {'widening': widening}) for widening in args.widening]
+        baseline = None
+        for name, cls, kwargs in configs:
+            agent = cls(game=game, rollouts=args.rollouts, depth=args.depth, policy=args.policy, early_stop=False, reuse_tree=False, **kwargs)
+
+            # Timed without tracing, then the same search again to measure the memory held by the tree
+            random.seed(args.seed)
+            start = time.perf_counter()
+            tree = agent.search(state, args.rollouts)
+            elapsed = time.perf_counter() - start
+            del tree
+            random.seed(args.seed)
+            tracemalloc.start()
+            tree = agent.search(state, args.rollouts)
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+
+            move, _ = max(agent.root_visits(tree), key=lambda visit: visit[1])
+            baseline = baseline if baseline else move
+            per_1k = 1000 / args.rollouts
+            successors = (agent.tree_size(tree) - 1) * per_1k
+            print(f'{f"{size}x{size}":>6} {name:>10} {elapsed * per_1k:>7.2f} {successors:>14.0f} {memory * per_1k / 1024:>8.0f} {str(move == baseline):>10}')
+
+
+def batch(args: argparse.Namespace) -> None:
+    # Playouts per second of QuoridorMCTSAgent.simulate against BatchQuoridor.simulate from the start position
+    print(f'{"board":>6} {"engine":>8} {"batch":>6} {"rollouts/s":>11} {"speedup":>8}')
+    for size, numwalls in [(5, 5), (9, 10)]:
+        game = BitboardQuoridor(size=size, numwalls=numwalls)
+        state = game.start_state()
+        agent = QuoridorMCTSAgent(game=game, depth=args.depth, policy=args.policy)
+        random.seed(args.seed)
+        start = time.perf_counter()
+        for _ in range(args.rollouts):
+            agent.simulate(state)
+        baseline = args.rollouts / (time.perf_counter() - start)
+        print(f'{f"{size}x{size}":>6} {"scalar":>8} {1:>6} {baseline:>11.1f} {1:>7.2f}x')
+
+        batch_game = BatchQuoridor(game)
+        rng = np.random.default_rng(args.seed)
+        for batch_size in args.batches:
+            start = time.perf_counter()
+            batch_game.simulate([state] * batch_size, args.depth, args.policy, agent.weights, rng)
+            rate = batch_size / (time.perf_counter() - start)
+            print(f'{f"{size}x{size}":>6} {"numpy":>8} {batch_size:>6} {rate:>11.1f} {rate / baseline:>7.2f}x')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--benchmark', type=str,
+                        help='Rollouts per second of the parallel modes over worker counts (parallel), '
+                             'games between serial and tree-parallel MCTS at a fixed time per move (tree), '
+                             'memory and selection speed of linked Node trees against ArrayTree (array), '
+                             'the cost per iteration of recursive against iterative selection and backup (iterative), '
+                             'tree growth with eager, lazy and progressively widened expansion (expansion), '
+                             'or playouts per second of the scalar and NumPy batch rollout engines (batch).',
+                        choices=['parallel', 'tree', 'array', 'iterative', 'expansion', 'batch'],
+                        default='parallel'
+    )
+    parser.add_argument('--workers', type=int, nargs='+',
+                        help='Worker counts to benchmark.',
+                        default=[1, 2, 4, 8, 16]
+    )
+    parser.add_argument('--rollouts', type=int,
+                        help='Rollouts per move.',
+                        default=400
+    )
+    parser.add_argument('--depth', type=int,
+                        help='Rollout depth.',
+                        default=30
+    )
+    parser.add_argument('--policy', type=str,
+                        help='Rollout policy.',
+                        choices=['random', 'random_pmove', 'forward_or_random', 'forward_or_random_pmove'],
+                        default='random'
+    )
+    parser.add_argument('--budget', type=float,
+                        help='Seconds per move in the tree benchmark.',
+                        default=0.5
+    )
+    parser.add_argument('--games', type=int,
+                        help='Games per worker count in the tree benchmark.',
+                        default=10
+    )
+    parser.add_argument('--nodes', type=int,
+                        help='Tree size in the array and iterative benchmarks.',
+                        default=100000
+    )
+    parser.add_argument('--branching', type=int, nargs='+',
+                        help='Children per expanded node in the array and iterative benchmarks.',
+                        default=[10, 40, 130]
+    )
+    parser.add_argument('--selects', type=int,
+                        help='Root to leaf selections timed in the array and iterative benchmarks.',
+                        default=2000
+    )
+    parser.add_argument('--depths', type=int, nargs='+',
+                        help='Depths of the single lines of play in the iterative benchmark.',
+                        default=[10, 100, 500, 2000]
+    )
+    parser.add_argument('--widening', type=float, nargs='+',
+                        help='Progressive widening coefficients in the expansion benchmark.',
+                        default=[1, 4]
+    )
+    parser.add_argument('--batches', type=int, nargs='+',
+                        help='Batch sizes in the batch benchmark.',
+                        default=[16, 256, 4096]
+    )
+    parser.add_argument('--seed', type=int,
+                        help='Seed for the rollouts.',
+                        default=0
+    )
+    args = parser.parse_args()
+    if args.benchmark == 'parallel':
+        parallel(args)
+    elif args.benchmark == 'tree':
+        tree(args)
+    elif args.benchmark == 'array':
+        array(args)
+    elif args.benchmark == 'iterative':
+        iterative(args)
+    elif args.benchmark == 'expansion':
+        expansion(args)
+    elif args.benchmark == 'batch':
+        batch(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+from games.quoridor import Quoridor
+from games.bitboard import BitboardQuoridor
+from benchmarks.alphabeta import positions
+from typing import Any, Callable
+import argparse
+import copy
+import time
+
+
+def per_second(operation: Callable, items: list[Any], repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for item in items:
+            operation(item)
+    return len(items) * repeats / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--positions', type=int,
+                        help='Number of random positions per board.',
+                        default=500
+    )
+    parser.add_argument('--moves', type=int,
+                        help='Maximum number of random moves played to reach each position.',
+                        default=60
+    )
+    parser.add_argument('--repeats', type=int,
+                        help='Times every operation is repeated over all positions.',
+                        default=50
+    )
+    parser.add_argument('--seed', type=int,
+                        help='Seed for the random positions.',
+                        default=0
+    )
+    args = parser.parse_args()
+
+    # Equality and lookups compare each state with an equal copy, as a cache hit does
+    print(f'{"board":>6} {"state":>13} {"hash/s":>11} {"eq/s":>11} {"lookup/s":>11} {"pack/s":>11} {"unpack/s":>11}')
+    for size, numwalls in [(5, 5), (9, 10)]:
+        game = Quoridor(size=size, numwalls=numwalls)
+        bitboard_game = BitboardQuoridor(size=size, numwalls=numwalls)
+        states = positions(game, args.positions, args.moves, args.seed)
+        packed = [game.pack(state) for state in states]
+        for name, items in [('State', states), ('BitboardState', [bitboard_game.from_state(state) for state in states]), ('PackedState', packed)]:
+            copies = {id(item): copy.deepcopy(item) for item in items}
+            table = {copies[id(item)]: None for item in items}
+            hashes = per_second(hash, items, args.repeats)
+            equalities = per_second(lambda item: item == copies[id(item)], items, args.repeats)
+            lookups = per_second(table.__contains__, items, args.repeats)
+            row = f'{f"{size}x{size}":>6} {name:>13} {hashes:>11.0f} {equalities:>11.0f} {lookups:>11.0f}'
+            if name == 'PackedState':
+                row += f' {per_second(game.pack, states, args.repeats):>11.0f} {per_second(game.unpack, packed, args.repeats):>11.0f}'
+            print(row)
+
+
+if __name__ == '__main__':
+    main()
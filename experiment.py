@@ -1,99 +1,317 @@
 from games.quoridor import Quoridor
+from games.bitboard import BitboardQuoridor
 from games.tictactoe import TicTacToe
 from agents.random import RandomAgent
 from agents.human import HumanAgent
-from agents.mcts import MCTSAgent, QuoridorMCTSAgent
-from agents.minmax import QuoridorAlphaBetaAgent, AlphaBetaAgent
+from agents.mcts import MCTSAgent, QuoridorMCTSAgent, TreeParallelMCTSAgent, QuoridorTreeParallelMCTSAgent
+from agents.array_mcts import ArrayMCTSAgent, QuoridorArrayMCTSAgent
+from agents.minmax import QuoridorAlphaBetaAgent, AlphaBetaAgent, ParallelAlphaBetaAgent, QuoridorParallelAlphaBetaAgent
 from utils import initialize_parser
+from records import GameRecordWriter, read_records
+from profiling import profiler, write_profile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Tuple
 import argparse
+import json
+import multiprocessing
+import random
 import time
 import os
 
 
-def evaluate(args: argparse.Namespace) -> None:
+def make_agent(args: argparse.Namespace, game: Any, name: str, player: int) -> Any:
+    # Agent configured by the --p1* or --p2* flags (name 'p1' or 'p2'), playing as player
+    options = vars(args)
+    cls = globals()[options[name]]
+    return cls(
+        game=game, 
+        depth=options[f'{name}_depth'], 
+        rollouts=options[f'{name}_rollouts'], 
+        player=player, 
+        policy=options[f'{name}_policy'], 
+        time_limit=options[f'{name}_time_limit'], 
+        workers=options[f'{name}_workers'], 
+        parallel=options[f'{name}_parallel'], 
+        batch=options[f'{name}_batch'], 
+        early_stop=options[f'{name}_early_stop'], 
+        ordering=options[f'{name}_ordering']
+    )
 
-    verbose = args.verbose
 
-    # Setup game
-    trials = args.trials
+def play_game(game: Any, first: Any, second: Any, profiler: Any = None) -> Tuple[float, int, list[float], list[float], list[dict]]:
+    # Plays one game, returns the first player's score (1 win, 0.5 draw, 0 loss), the number of moves,
+    # the move times of both players and every move with the stats of the search that chose it.
+    # With an enabled profiler, every move also gets the profile of the calls made while choosing it.
+    first_move_times = []
+    second_move_times = []
+    history = []
+    moves = 0
+
+    # Begin play
+    state = game.start_state()
+    while not game.is_end(state):
+
+        moves += 1
+
+        if profiler:
+            profiler.take() # Drop the calls made between moves
+        start, start_ns = time.time(), time.perf_counter_ns()
+        action = first.action(state)
+        end, end_ns = time.time(), time.perf_counter_ns()
+        first_move_times.append(end-start)
+        history.append({'player': 1, 'action': action, 'time': end-start, 'stats': dict(getattr(first, 'stats', {}))})
+        if profiler:
+            history[-1]['profile'] = profiler.move(start_ns, end_ns)
+
+        state = game.successor(state, action)
+
+        if game.is_end(state):
+            break
+
+        if profiler:
+            profiler.take() # Drop the calls made between moves
+        start, start_ns = time.time(), time.perf_counter_ns()
+        action = second.action(state)
+        end, end_ns = time.time(), time.perf_counter_ns()
+        second_move_times.append(end-start)
+        history.append({'player': 2, 'action': action, 'time': end-start, 'stats': dict(getattr(second, 'stats', {}))})
+        if profiler:
+            history[-1]['profile'] = profiler.move(start_ns, end_ns)
+
+        state = game.successor(state, action)
+
+        if game.is_end(state):
+            break
+
+        if moves > 200:
+            return 0.5, moves, first_move_times, second_move_times, history
+
+    utility = game.utility(state)
+    return (1 if utility == game.win_bonus else 0 if utility == -game.win_bonus else 0.5), moves, first_move_times, second_move_times, history
+
+
+def print_outcome(args: argparse.Namespace, index: int, score: float, moves: int, swapped: bool = False) -> None:
+    # score is the result of --p1, which moved second if swapped
+    players = [f'Player 1: {args.p1}', f'Player 2: {args.p2}']
+    if score == 0.5 and moves > 200:
+        print(f'Game #{index + 1} has ended. The game length exceeded 200 moves. The game was called a draw.')
+    elif score == 0.5:
+        print(f'Game #{index + 1} has ended in a draw. The game lasted {moves} moves.')
+    else:
+        colors = ' (colors swapped)' if swapped else ''
+        print(f'Game #{index + 1} has ended. {players[0] if score == 1 else players[1]} won{colors}. The game lasted {moves} moves.')
+    print()
+
+
+def game_record(args: argparse.Namespace, index: int, seed: Any, swapped: bool, score: float, history: list[dict]) -> dict:
+    # One game in the --record file. Moves list the seat that played them, 1 for the player that moved
+    # first, which is --p2 if the colors were swapped. The result is the score of --p1.
+    return {
+        'type': 'game',
+        'game': index,
+        'seed': seed,
+        'first': args.p2 if swapped else args.p1,
+        'second': args.p1 if swapped else args.p2,
+        'swapped': swapped,
+        'result': score,
+        'moves': history
+    }
+
+
+def play_trial(args: argparse.Namespace, game: Any, index: int, seed: int, alternate: bool) -> Tuple[int, bool, float, int, list[float], list[float], list[dict]]:
+    # Plays game number index with fresh agents and its own RNG seed, so the outcome depends only on
+    # the index and the run seed, not on earlier games, the worker playing it or a resumed run.
+    # If alternate, odd games give --p2 the first move. Scores and move times are those of --p1 and --p2.
+    swapped = alternate and index % 2 == 1
+    first, second = ('p2', 'p1') if swapped else ('p1', 'p2')
+    random.seed(f'{seed}:{index}')
+    if args.profile:
+        profiler.enable()
+    agents = [make_agent(args, game, first, 1), make_agent(args, game, second, 2)]
+    score, moves, first_move_times, second_move_times, history = play_game(game, *agents, profiler if args.profile else None)
+    for agent in agents:
+        if hasattr(agent, 'close'):
+            agent.close()
+    if swapped:
+        return index, True, 1 - score, moves, second_move_times, first_move_times, history
+    return index, False, score, moves, first_move_times, second_move_times, history
+
+
+# Per-process state of tournament workers
+_worker_args = None
+_worker_game = None
+
+
+def _init_worker(args: argparse.Namespace) -> None:
+    global _worker_args, _worker_game
+    _worker_args = args
     g_cls = globals()[args.g]
-    game = g_cls(size=args.s, numwalls=args.w)
+    _worker_game = g_cls(size=args.s, numwalls=args.w)
 
-    # Initialize players
-    p1_cls = globals()[args.p1]
-    p1 = p1_cls(game=game, depth=args.p1_depth, rollouts=args.p1_rollouts, player=1, policy=args.p1_policy)
 
-    p2_cls = globals()[args.p2]
-    p2 = p2_cls(game=game, depth=args.p2_depth, rollouts=args.p2_rollouts, player=2, policy=args.p2_policy)    
+def _play_tournament_game(index: int, seed: int) -> Tuple[int, bool, float, int, list[float], list[float], list[dict]]:
+    return play_trial(_worker_args, _worker_game, index, seed, _worker_args.alternate)
+
+
+# Arguments that may change when a run is resumed, all others must match the checkpoint
+_RESUMABLE_ARGS = ['trials', 'jobs', 'verbose', 'record', 'checkpoint', 'checkpoint_every', 'resume', 'profile', 'profile_format']
+
+
+def new_tally() -> dict:
+    # Aggregate results of the completed games, as saved in checkpoints
+    return {
+        'completed': [], # Indices of the completed games as [start, stop) ranges
+        'p1_wins': 0, # Score of --p1, draws count half
+        'draws': 0,
+        'p1_second_wins': 0, # Score of --p1 when it moved second, with --alternate
+        'p1_move_time': 0,
+        'p1_moves': 0,
+        'p2_move_time': 0,
+        'p2_moves': 0,
+        'game_length': 0
+    }
 
-    if verbose:
-        print()
-        print('Arguments:')
-        for arg in vars(args): 
-            print(f'\t{arg}: {vars(args)[arg]}')
-        print()
 
-    # Begin trials
-    p1_wins = 0
-    p1_move_times = []
-    p2_move_times = []
-    game_length = []
+def add_game(tally: dict, index: int, swapped: bool, score: float, moves: int, p1_move_times: list[float], p2_move_times: list[float]) -> None:
+    tally['p1_wins'] += score
+    tally['draws'] += score == 0.5
+    tally['p1_second_wins'] += score if swapped else 0
+    tally['p1_move_time'] += sum(p1_move_times)
+    tally['p1_moves'] += len(p1_move_times)
+    tally['p2_move_time'] += sum(p2_move_times)
+    tally['p2_moves'] += len(p2_move_times)
+    tally['game_length'] += moves
 
-    for _ in range(trials):
+    # Games mostly complete in order, so the ranges stay few
+    ranges = tally['completed']
+    ranges.append([index, index + 1])
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, stop in ranges[1:]:
+        if start == merged[-1][1]:
+            merged[-1][1] = stop
+        else:
+            merged.append([start, stop])
+    tally['completed'] = merged
 
-        moves = 0
 
-        # Begin play
-        state = game.start_state()
-        while not game.is_end(state):
+def completed_games(tally: dict) -> set[int]:
+    return {index for start, stop in tally['completed'] for index in range(start, stop)}
 
-            moves += 1
 
-            start = time.time()
-            action = p1.action(state)
-            end = time.time()
-            p1_move_times.append(end-start)
+def games_played(tally: dict) -> int:
+    return sum(stop - start for start, stop in tally['completed'])
 
-            state = game.successor(state, action)
 
-            if game.is_end(state):
-                p1_wins += 1 if game.utility(state) == game.win_bonus else 0
-                break
+def save_checkpoint(path: str, args: argparse.Namespace, seed: int, tally: dict) -> None:
+    # Written to a temporary file first, so a crash mid-write leaves the previous checkpoint intact
+    with open(path + '.tmp', 'w') as file:
+        json.dump({'args': vars(args), 'seed': seed, 'tally': tally}, file)
+    os.replace(path + '.tmp', path)
 
-            start = time.time()
-            action = p2.action(state)
-            end = time.time()
-            p2_move_times.append(end-start)
 
-            state = game.successor(state, action)
+def load_checkpoint(path: str, args: argparse.Namespace) -> Tuple[int, dict]:
+    with open(path) as file:
+        checkpoint = json.load(file)
+    for arg, value in vars(args).items():
+        if arg not in _RESUMABLE_ARGS and arg != 'seed' and checkpoint['args'].get(arg) != value:
+            raise ValueError(f'Cannot resume from {path}: --{arg} was {checkpoint["args"].get(arg)}, not {value}.')
+    if args.seed is not None and args.seed != checkpoint['seed']:
+        raise ValueError(f'Cannot resume from {path}: the run used seed {checkpoint["seed"]}, not {args.seed}.')
+    return checkpoint['seed'], checkpoint['tally']
 
-            if game.is_end(state):
-                p1_wins += 1 if game.utility(state) == game.win_bonus else 0
-                break
 
-            if moves > 200:
-                p1_wins += 0.5
-                break
+def evaluate(args: argparse.Namespace) -> None:
+
+    verbose = args.verbose
 
+    # Setup game
+    trials = args.trials
+    g_cls = globals()[args.g]
+    game = g_cls(size=args.s, numwalls=args.w)
+
+    if verbose:
+        print()
+        print('Arguments:')
+        for arg in vars(args): 
+            print(f'\t{arg}: {vars(args)[arg]}')
+        print()
+
+    # Pick up the results of an earlier run of the same experiment
+    if args.resume and not args.checkpoint:
+        raise ValueError('Please enter a checkpoint file to resume from.')
+    if args.resume and os.path.exists(args.checkpoint):
+        seed, tally = load_checkpoint(args.checkpoint, args)
         if verbose:
-            if game.utility(state) == game.win_bonus:
-                print(f'Game #{_ + 1} has ended. Player 1: {args.p1} won. The game lasted {moves} moves.')
-            elif game.utility(state) == -game.win_bonus:
-                print(f'Game #{_ + 1} has ended. Player 2: {args.p2} won. The game lasted {moves} moves.')
-            else:
-                print(f'Game #{_ + 1} has ended. The game length exceeded 200 moves. The game was called a draw.')
+            print(f'Resuming from {args.checkpoint}: {games_played(tally)} games already played.')
             print()
+    else:
+        seed = args.seed if args.seed is not None else random.getrandbits(32)
+        tally = new_tally()
+    completed = completed_games(tally)
+    remaining = [i for i in range(trials) if i not in completed]
+    start = time.time()
+
+    # Stream every game to the record file as it ends. A game can be recorded and then replayed on
+    # resume if the run stopped before its checkpoint was saved, so games already recorded are skipped.
+    recorded = set()
+    if args.record and args.resume and os.path.exists(args.record):
+        recorded = {record['seed'] for record in read_records(args.record) if record['type'] == 'game'}
+    writer = GameRecordWriter(args.record) if args.record else None
+    if writer:
+        writer.write({'type': 'run', 'args': vars(args), 'seed': seed, 'started': start})
+
+    # Profiles of the games played by this run, written once it ends
+    profiled = []
+
+    def finish_game(index: int, swapped: bool, score: float, moves: int, times_1: list[float], times_2: list[float], history: list[dict]) -> None:
+        add_game(tally, index, swapped, score, moves, times_1, times_2)
+        if args.profile:
+            profiled.append((index, swapped, history))
+        if writer and f'{seed}:{index}' not in recorded:
+            writer.write(game_record(args, index, f'{seed}:{index}', swapped, score, history))
+        if args.checkpoint and games_played(tally) % args.checkpoint_every == 0:
+            save_checkpoint(args.checkpoint, args, seed, tally)
+        if verbose:
+            print_outcome(args, index, score, moves, swapped)
+
+    if args.jobs > 1:
+        # Tournament: games spread over a process pool, results arrive as they finish
+        # Spawned rather than forked workers, so agents can still start process pools of their own
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=args.jobs, mp_context=context, initializer=_init_worker, initargs=(args,)) as pool:
+            futures = [pool.submit(_play_tournament_game, i, seed) for i in remaining]
+            for future in as_completed(futures):
+                finish_game(*future.result())
+    else:
+        for i in remaining:
+            finish_game(*play_trial(args, game, i, seed, args.alternate))
 
-        game_length.append(moves)
+    if writer:
+        writer.close()
+    if args.checkpoint:
+        save_checkpoint(args.checkpoint, args, seed, tally)
+    if args.profile:
+        write_profile(args.profile, sorted(profiled, key=lambda game: game[0]), args.profile_format)
 
     # Print statistics
+    played = games_played(tally)
+    p1_wins = tally['p1_wins']
+    draws = tally['draws']
     print(f'Evaluation concluded! Outcomes:')
-    print(f'\tGames played: {trials}.')
-    print(f'\tPlayer 1: {args.p1} won {p1_wins} games.')
-    print(f'\tPlayer 2: {args.p2} won {trials-p1_wins} games.')
-    print(f'\tOn average, player 1 took {round(sum(p1_move_times) / len(p1_move_times), 2)} seconds per move.')
-    print(f'\tOn average, player 2 took {round(sum(p2_move_times) / len(p2_move_times), 2)} seconds per move.')
-    print(f'\tThe average game was {round(sum(game_length) / len(game_length))} moves long.')
+    print(f'\tGames played: {played}.')
+    print(f'\tPlayer 1: {args.p1} won {p1_wins - draws/2:g} games.')
+    print(f'\tPlayer 2: {args.p2} won {played - p1_wins - draws/2:g} games.')
+    if draws:
+        print(f'\t{draws} games were drawn.')
+    if args.alternate:
+        print(f'\tColors alternated: player 1 scored {p1_wins - tally["p1_second_wins"]:g} moving first and {tally["p1_second_wins"]:g} moving second.')
+    print(f'\tOn average, player 1 took {round(tally["p1_move_time"] / tally["p1_moves"], 2)} seconds per move.')
+    print(f'\tOn average, player 2 took {round(tally["p2_move_time"] / tally["p2_moves"], 2)} seconds per move.')
+    print(f'\tThe average game was {round(tally["game_length"] / played)} moves long.')
+    print(f'\tThe evaluation took {round(time.time() - start, 2)} seconds with {max(args.jobs, 1)} processes.')
+    if args.profile:
+        print(f'\tThe profile of the {len(profiled)} games played by this run was written to {args.profile}.')
 
 
 def main():
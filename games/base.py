@@ -20,5 +20,11 @@ class AdversarialGame:
     def is_end(self, state: Any) -> bool:
         raise NotImplementedError()
     
+    def zobrist_hash(self, state: Any) -> int:
+        raise NotImplementedError()
+    
+    def zobrist_update(self, key: int, state: Any, action: Any) -> int:
+        raise NotImplementedError()
+    
     def visualize(self, state: Any) -> bool:
         raise NotImplementedError()
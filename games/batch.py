@@ -0,0 +1,298 @@
+from dataclasses import dataclass
+from typing import Any, Tuple
+from games.quoridor import Quoridor
+import numpy as np
+
+
+@dataclass
+class BatchState:
+    # Many Quoridor positions as arrays, cells are numbered y * size + x
+    pawns: np.ndarray # (B, 2) cells of player 1 and player 2
+    numwalls: np.ndarray # (B, 2) walls left for player 1 and player 2
+    player: np.ndarray # (B,) 0 if player 1 is to move, 1 if player 2 is
+    blocked: np.ndarray # (B, cells, 4) True if the step from a cell in a direction is blocked, including steps off the board
+    occupied: np.ndarray # (B, 2 * slots) wall slots taken by or conflicting with placed walls, h_wall slots first
+    corners: np.ndarray # (B, (size + 1) ** 2) grid corners touched by a wall or the edge of the board
+
+
+class BatchQuoridor:
+    # Plays many independent Quoridor games in lockstep on NumPy arrays, for rollouts.
+    # Pawn moves are generated as masks over a fixed list of moves, and path checks grow
+    # the cells reachable from both pawns for the whole batch at once. A wall can only cut
+    # the board in two if it touches other walls or the edge in at least two of its three
+    # corners, so only those walls are path checked.
+    def __init__(self, game: Quoridor, max_draws: int = 8) -> None:
+        self.game = game
+        self.size = n = game.size
+        m = n - 1
+        self.num_cells = n * n
+        self.num_slots = m * m
+        self.max_draws = max_draws # Rejected wall draws per move before a game chooses from the full list of legal moves
+
+        # Neighbor of every cell in every direction, steps off the board lead to the padding cell n * n
+        self.neighbors = np.full((n * n, 4), n * n)
+        for cell in range(n * n):
+            x, y = cell % n, cell // n
+            for d, (dx, dy) in enumerate(game.directions):
+                if game._in_bounds((x + dx, y + dy)):
+                    self.neighbors[cell, d] = (y + dy) * n + x + dx
+        self.border = self.neighbors == n * n
+        corners = np.arange((n + 1) ** 2)
+        self.border_corners = (corners % (n + 1) % n == 0) | (corners // (n + 1) % n == 0)
+
+        # Steps blocked by and slots conflicting with each wall, indexed by kind * slots + y * (size - 1) + x
+        # with kind 0 for h_walls and 1 for v_walls
+        up, down, right, left = [game.directions.index(d) for d in [(0, 1), (0, -1), (1, 0), (-1, 0)]]
+        self.wall_cells = np.zeros((2 * m * m, 4), dtype=np.int64)
+        self.wall_directions = np.zeros((2 * m * m, 4), dtype=np.int64)
+        self.conflicts = np.zeros((2 * m * m, 2 * m * m), dtype=bool)
+        self.wall_corners = np.zeros((2 * m * m, 3), dtype=np.int64) # Corners are numbered y * (size + 1) + x
+        for (x, y) in game.wall_placement_candidates:
+            a, b = y * n + x, y * n + x + 1 # Cells below a h_wall, left of a v_wall
+            c, d = a + n, b + n
+            h, v = self._wall_index('h_wall', (x, y)), self._wall_index('v_wall', (x, y))
+            self.wall_cells[h], self.wall_directions[h] = [a, c, b, d], [up, down, up, down]
+            self.wall_cells[v], self.wall_directions[v] = [a, b, c, d], [right, left, right, left]
+            self.wall_corners[h] = [(y + 1) * (n + 1) + x + i for i in range(3)]
+            self.wall_corners[v] = [(y + i) * (n + 1) + x + 1 for i in range(3)]
+            for wall in [h, v]:
+                for conflict in game.wall_conflicts[('h_wall' if wall == h else 'v_wall', (x, y))]:
+                    self.conflicts[wall, self._wall_index(*conflict)] = True
+
+        # Pawn moves: plain steps, straight hops, then diagonal hops
+        self.moves = list(game.directions) + [game._hop_straight(direction) for direction in game.directions]
+        self.moves += [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+        self.move_steps = np.array([dy * n + dx for (dx, dy) in self.moves])
+        self.diagonals = [] # (direction, side step, move) for every diagonal hop past an opponent in direction
+        for d, direction in enumerate(game.directions):
+            for hop in game._hop_diagonally(direction):
+                side = (hop[0] - direction[0], hop[1] - direction[1])
+                self.diagonals.append((d, game.directions.index(side), self.moves.index(hop)))
+        self.forward = np.array([self.moves.index((0, 1)), self.moves.index((0, -1))]) # Per player index
+
+    def _wall_index(self, move_type: str, move: Tuple[int, int]) -> int:
+        kind = 0 if move_type == 'h_wall' else 1
+        return kind * self.num_slots + move[1] * (self.size - 1) + move[0]
+
+    def _wall_list(self, walls: Any) -> list[Tuple[int, int]]:
+        # Walls as a set of coordinates, or as the bitmask of a BitboardState
+        if isinstance(walls, int):
+            m = self.size - 1
+            return [(slot % m, slot // m) for slot in range(m * m) if walls >> slot & 1]
+        return list(walls)
+
+    def from_states(self, states: list[Any]) -> BatchState:
+        n = self.size
+        batch = BatchState(
+            pawns=np.array([[s.p1[1] * n + s.p1[0], s.p2[1] * n + s.p2[0]] for s in states]),
+            numwalls=np.array([[s.p1_numwalls, s.p2_numwalls] for s in states]),
+            player=np.array([s.player - 1 for s in states]),
+            blocked=np.repeat(self.border[None], len(states), axis=0),
+            occupied=np.zeros((len(states), 2 * self.num_slots), dtype=bool),
+            corners=np.repeat(self.border_corners[None], len(states), axis=0)
+        )
+        for i, s in enumerate(states):
+            walls = [self._wall_index('h_wall', wall) for wall in self._wall_list(s.h_walls)]
+            walls += [self._wall_index('v_wall', wall) for wall in self._wall_list(s.v_walls)]
+            if walls:
+                games = np.full(len(walls), i)
+                self._add_walls(batch.blocked, games, np.array(walls))
+                batch.occupied[i] |= self.conflicts[walls].any(axis=0)
+                batch.corners[i, self.wall_corners[walls]] = True
+        return batch
+
+    def _add_walls(self, blocked: np.ndarray, rows: np.ndarray, walls: np.ndarray) -> None:
+        blocked[rows[:, None], self.wall_cells[walls], self.wall_directions[walls]] = True
+
+    def is_end(self, batch: BatchState) -> np.ndarray:
+        rows = batch.pawns // self.size
+        return (rows[:, 0] == self.size - 1) | (rows[:, 1] == 0)
+
+    def pawn_moves(self, batch: BatchState, games: np.ndarray) -> np.ndarray:
+        # (len(games), len(self.moves)) mask of legal pawn moves, by the same rules as Quoridor._get_pawn_moves
+        player = batch.player[games]
+        me = batch.pawns[games, player]
+        opp = batch.pawns[games, 1 - player]
+        blocked_me = batch.blocked[games, me]
+        blocked_opp = batch.blocked[games, opp]
+        adjacent = (self.neighbors[me] == opp[:, None]) & ~blocked_me
+
+        mask = np.zeros((len(games), len(self.moves)), dtype=bool)
+        mask[:, :4] = ~blocked_me & (self.neighbors[me] != opp[:, None])
+        mask[:, 4:8] = adjacent & ~blocked_opp
+        for d, side, move in self.diagonals:
+            mask[:, move] |= adjacent[:, d] & blocked_opp[:, d] & ~blocked_opp[:, side]
+        return mask
+
+    def distances(self, blocked: np.ndarray) -> np.ndarray:
+        # (len(blocked), 2, cells + 1) steps from every cell to the goal rows of player 1 and player 2.
+        # All cells are relaxed at once until nothing changes, unreachable cells keep the value num_cells.
+        n, num_cells = self.size, self.num_cells
+        distances = np.full((len(blocked), 2, num_cells + 1), num_cells, dtype=np.int16)
+        distances[:, 0, num_cells-n:num_cells] = 0
+        distances[:, 1, :n] = 0
+        walls = [blocked[:, None, :, d] for d in range(4)]
+        while True:
+            current = distances[:, :, :num_cells]
+            relaxed = current
+            for d in range(4):
+                relaxed = np.minimum(relaxed, np.where(walls[d], num_cells, distances[:, :, self.neighbors[:, d]] + 1))
+            if np.array_equal(relaxed, current):
+                return distances
+            distances[:, :, :num_cells] = relaxed
+
+    def connected(self, blocked: np.ndarray, pawns: np.ndarray) -> np.ndarray:
+        # (len(blocked),) whether both pawns can still reach their goal rows. Grows the cells reachable
+        # from each pawn in lockstep, and drops a game once both goals are reached or nothing grows.
+        n, num_cells = self.size, self.num_cells
+        goals = np.zeros((2, num_cells + 1), dtype=bool)
+        goals[0, num_cells-n:num_cells] = True
+        goals[1, :n] = True
+
+        rows = np.arange(len(blocked))
+        reached = np.zeros((len(blocked), 2, num_cells + 1), dtype=bool)
+        reached[rows, 0, pawns[:, 0]] = True
+        reached[rows, 1, pawns[:, 1]] = True
+        open = ~blocked[:, None]
+        connected = np.zeros(len(blocked), dtype=bool)
+        while len(rows):
+            arrived = (reached & goals).any(axis=2).all(axis=1)
+            connected[rows[arrived]] = True
+            grown = reached.copy()
+            for d in range(4):
+                grown[:, :, :num_cells] |= reached[:, :, self.neighbors[:, d]] & open[:, :, :, d]
+            active = ~arrived & (grown != reached).any(axis=(1, 2))
+            rows, reached, open = rows[active], grown[active], open[active]
+        return connected
+
+    def _move_pawns(self, batch: BatchState, games: np.ndarray, moves: np.ndarray) -> None:
+        batch.pawns[games, batch.player[games]] += self.move_steps[moves]
+
+    def _legal_walls(self, batch: BatchState, games: np.ndarray) -> np.ndarray:
+        # (len(games), 2 * slots) mask of the walls that _place_walls would accept
+        legal = ~batch.occupied[games]
+        rows, walls = legal.nonzero()
+        closing = batch.corners[games[rows][:, None], self.wall_corners[walls]].sum(axis=1) >= 2
+        rows, walls = rows[closing], walls[closing]
+        blocked = batch.blocked[games[rows]]
+        self._add_walls(blocked, np.arange(len(rows)), walls)
+        cut = ~self.connected(blocked, batch.pawns[games[rows]])
+        legal[rows[cut], walls[cut]] = False
+        return legal
+
+    def _place_walls(self, batch: BatchState, games: np.ndarray, walls: np.ndarray) -> np.ndarray:
+        # Places the walls that keep both players connected to their goal rows, returns which ones were legal
+        legal = ~batch.occupied[games, walls]
+        games, walls = games[legal], walls[legal]
+
+        # Path check the walls that touch the existing ones or the edge at two or more corners
+        connected = np.ones(len(games), dtype=bool)
+        closing = batch.corners[games[:, None], self.wall_corners[walls]].sum(axis=1) >= 2
+        if closing.any():
+            blocked = batch.blocked[games[closing]]
+            self._add_walls(blocked, np.arange(len(blocked)), walls[closing])
+            connected[closing] = self.connected(blocked, batch.pawns[games[closing]])
+
+        games, walls = games[connected], walls[connected]
+        self._add_walls(batch.blocked, games, walls)
+        batch.occupied[games] |= self.conflicts[walls]
+        batch.corners[games[:, None], self.wall_corners[walls]] = True
+        batch.numwalls[games, batch.player[games]] -= 1
+        legal[legal] = connected
+        return legal
+
+    def step(self, batch: BatchState, games: np.ndarray, rng: np.random.Generator, policy: str = 'random') -> None:
+        # One move in each of the games, drawn like the QuoridorMCTSAgent policy of the same name
+        if policy not in ['random', 'random_pmove', 'forward_or_random', 'forward_or_random_pmove']:
+            raise ValueError('Please enter valid policy for MCTS agent.')
+        mask = self.pawn_moves(batch, games)
+        num_pawn_moves = mask.sum(axis=1)
+        pending = np.ones(len(games), dtype=bool)
+
+        if policy.startswith('forward'):
+            forward = self.forward[batch.player[games]]
+            legal = mask[np.arange(len(games)), forward]
+            self._move_pawns(batch, games[legal], forward[legal])
+            pending &= ~legal
+
+        # Uniform over the pawn moves and every wall slot, drawn walls are checked and illegal ones redrawn
+        walls = policy in ['random', 'forward_or_random']
+        has_walls = (batch.numwalls[games, batch.player[games]] > 0) & walls
+        if walls:
+            for _ in range(self.max_draws):
+                i = pending.nonzero()[0]
+                if len(i) == 0:
+                    break
+                draws = (rng.random(len(i)) * (num_pawn_moves[i] + has_walls[i] * 2 * self.num_slots)).astype(np.int64)
+                pawn = draws < num_pawn_moves[i]
+                j = i[pawn]
+                moves = (mask[j].cumsum(axis=1) > draws[pawn][:, None]).argmax(axis=1)
+                self._move_pawns(batch, games[j], moves)
+                pending[j] = False
+                j = i[~pawn]
+                placed = self._place_walls(batch, games[j], draws[~pawn] - num_pawn_moves[j])
+                pending[j[placed]] = False
+
+        # The rest choose uniformly from the full list of legal moves, like Quoridor.random_action when
+        # nearly every slot is taken, so the moves keep the same distribution as rng.choice(actions)
+        i = pending.nonzero()[0]
+        legal = np.zeros((len(i), len(self.moves) + 2 * self.num_slots), dtype=bool)
+        legal[:, :len(self.moves)] = mask[i]
+        legal[has_walls[i], len(self.moves):] = self._legal_walls(batch, games[i[has_walls[i]]])
+        scores = rng.random(legal.shape)
+        scores[~legal] = -1
+        choices = scores.argmax(axis=1)
+        pawn = choices < len(self.moves)
+        self._move_pawns(batch, games[i[pawn]], choices[pawn])
+        self._place_walls(batch, games[i[~pawn]], choices[~pawn] - len(self.moves))
+        batch.player[games] = 1 - batch.player[games]
+
+    def playout(self, batch: BatchState, depth: int, policy: str = 'random', rng: np.random.Generator = None) -> np.ndarray:
+        # Plays every game up to depth moves or its end, returns the moves played per game
+        rng = rng if rng is not None else np.random.default_rng()
+        played = np.zeros(len(batch.player), dtype=np.int64)
+        for _ in range(depth):
+            games = (~self.is_end(batch)).nonzero()[0]
+            if len(games) == 0:
+                break
+            self.step(batch, games, rng, policy)
+            played[games] += 1
+        return played
+
+    def evaluate(self, batch: BatchState, player: np.ndarray, weights: list[float]) -> np.ndarray:
+        # Utility of finished games and evaluate_state features of the others, from the view of player.
+        # Path lengths are pawn-free distances to the goal row.
+        n = self.size
+        rows = batch.pawns // n
+        p1_won = rows[:, 0] == n - 1
+        p2_won = rows[:, 1] == 0
+        utility = (p1_won.astype(float) - p2_won) * self.game.win_bonus
+        values = np.where(player == 0, utility, -utility)
+
+        live = (~(p1_won | p2_won)).nonzero()[0]
+        if len(live):
+            distances = self.distances(batch.blocked[live])
+            rows_live = np.arange(len(live))
+            p1_distance = distances[rows_live, 0, batch.pawns[live, 0]]
+            p2_distance = distances[rows_live, 1, batch.pawns[live, 1]]
+            p1_progress = rows[live, 0]
+            p2_progress = n - 1 - rows[live, 1]
+            first = player[live] == 0
+            features = [
+                -np.where(first, p1_distance, p2_distance),
+                np.where(first, p2_distance, p1_distance),
+                np.where(first, batch.numwalls[live, 0], batch.numwalls[live, 1]),
+                np.where(first, batch.numwalls[live, 1], batch.numwalls[live, 0]),
+                np.where(first, p1_progress, p2_progress),
+                np.where(first, p2_progress, p1_progress)
+            ]
+            values[live] = sum(weight * feature for weight, feature in zip(weights, features))
+        return values
+
+    def simulate(self, states: list[Any], depth: int, policy: str = 'random', weights: list[float] = [0, 0, 0, 0, 0, 0], rng: np.random.Generator = None) -> np.ndarray:
+        # Vectorized MCTSAgent.simulate: the negated, depth-discounted outcome of a playout from each state
+        batch = self.from_states(states)
+        player = batch.player.copy()
+        played = self.playout(batch, depth, policy, rng)
+        values = self.evaluate(batch, player, weights)
+        return -values * (depth - played + 1) / depth
@@ -0,0 +1,355 @@
+from dataclasses import dataclass, field
+from typing import Tuple, Any
+from games.quoridor import Quoridor, State, PackedState
+
+
+@dataclass(frozen=True)
+class BitboardState:
+    # Quoridor state with walls packed into integer bitmasks
+    p1: Tuple[int, int] # (x, y)
+    p2: Tuple[int, int]
+    p1_numwalls: int
+    p2_numwalls: int
+    player: int
+    h_walls: int # Bit i set if a h_wall occupies slot i = y * (size - 1) + x
+    v_walls: int
+    blocked: int = field(compare=False, repr=False) # Bit 4 * cell + direction set if that step is blocked
+    occupied: int = field(compare=False, repr=False) # Wall slots taken by or conflicting with placed walls
+
+    def __lt__(self, other) -> bool: # To prevent errors later
+        return True
+
+
+class BitboardQuoridor(Quoridor):
+    # Drop-in replacement for Quoridor that keeps the same actions and successors,
+    # but tests blocked steps and wall conflicts with single bit operations
+    def __init__(self, size=5, numwalls=3) -> None:
+        super().__init__(size=size, numwalls=numwalls)
+        n = self.size
+        m = self.size - 1
+        self._num_slots = m * m
+
+        # Precompute per-cell neighbors, -1 if the step leaves the board
+        self._neighbors = []
+        for cell in range(n * n):
+            x, y = cell % n, cell // n
+            self._neighbors.append(tuple(
+                (y + dy) * n + (x + dx) if self._in_bounds((x + dx, y + dy)) else -1
+                for dx, dy in self.directions
+            ))
+
+        # Neighbors a cell can step to for every combination of its four blocked bits
+        self._open = [
+            [tuple(s for d, s in enumerate(self._neighbors[cell]) if s != -1 and not steps >> d & 1) for steps in range(16)]
+            for cell in range(n * n)
+        ]
+
+        # Steps off the board are always blocked
+        self._border = 0
+        for cell in range(n * n):
+            for d in range(4):
+                if self._neighbors[cell][d] == -1:
+                    self._border |= 1 << (4 * cell + d)
+
+        # Precompute the steps each wall slot blocks and the slots it conflicts with.
+        # Conflict bits 0..m*m-1 are h_wall slots, m*m..2*m*m-1 are v_wall slots.
+        up, down, right, left = [self.directions.index(d) for d in [(0, 1), (0, -1), (1, 0), (-1, 0)]]
+        self._h_block = []
+        self._v_block = []
+        self._h_conflicts = []
+        self._v_conflicts = []
+        for slot in range(m * m):
+            x, y = slot % m, slot // m
+            a, b = y * n + x, y * n + x + 1 # Cells below the h_wall
+            c, d = a + n, b + n # Cells above the h_wall
+            self._h_block.append(
+                1 << (4 * a + up) | 1 << (4 * c + down) | 1 << (4 * b + up) | 1 << (4 * d + down)
+            )
+            self._v_block.append(
+                1 << (4 * a + right) | 1 << (4 * b + left) | 1 << (4 * c + right) | 1 << (4 * d + left)
+            )
+
+            h_conflicts = 1 << slot | 1 << (m * m + slot)
+            v_conflicts = 1 << slot | 1 << (m * m + slot)
+            if x > 0:
+                h_conflicts |= 1 << (slot - 1)
+            if x < m - 1:
+                h_conflicts |= 1 << (slot + 1)
+            if y > 0:
+                v_conflicts |= 1 << (m * m + slot - m)
+            if y < m - 1:
+                v_conflicts |= 1 << (m * m + slot + m)
+            self._h_conflicts.append(h_conflicts)
+            self._v_conflicts.append(v_conflicts)
+
+        # Candidates in the same order as Quoridor.wall_placement_candidates
+        self._slot_candidates = [(y * m + x, (x, y)) for (x, y) in self.wall_placement_candidates]
+
+        # Side steps tried when a straight hop is blocked, in the order of Quoridor._hop_diagonally
+        self._diagonals = []
+        for direction in self.directions:
+            sides = [(hop[0] - direction[0], hop[1] - direction[1]) for hop in self._hop_diagonally(direction)]
+            self._diagonals.append([(self.directions.index(side), (direction[0] + side[0], direction[1] + side[1])) for side in sides])
+        self._hops = [self._hop_straight(direction) for direction in self.directions]
+
+    def _cell(self, p: Tuple[int, int]) -> int:
+        return p[1] * self.size + p[0]
+
+    def start_state(self) -> BitboardState:
+        mid = self.size // 2
+        return BitboardState(
+            p1=(mid, 0),
+            p2=(mid, self.size-1),
+            p1_numwalls=self.numwalls,
+            p2_numwalls=self.numwalls,
+            player=1,
+            h_walls=0,
+            v_walls=0,
+            blocked=self._border,
+            occupied=0
+        )
+
+    def from_state(self, state: State) -> BitboardState:
+        # Convert a frozenset-based Quoridor state into its bitboard equivalent
+        m = self.size - 1
+        h_walls, v_walls, blocked, occupied = 0, 0, self._border, 0
+        for (x, y) in state.h_walls:
+            h_walls, v_walls, blocked, occupied = self._place_wall(h_walls, v_walls, blocked, occupied, 'h_wall', y * m + x)
+        for (x, y) in state.v_walls:
+            h_walls, v_walls, blocked, occupied = self._place_wall(h_walls, v_walls, blocked, occupied, 'v_wall', y * m + x)
+        return BitboardState(
+            p1=state.p1,
+            p2=state.p2,
+            p1_numwalls=state.p1_numwalls,
+            p2_numwalls=state.p2_numwalls,
+            player=state.player,
+            h_walls=h_walls,
+            v_walls=v_walls,
+            blocked=blocked,
+            occupied=occupied
+        )
+
+    def to_state(self, state: BitboardState) -> State:
+        # Convert back into a frozenset-based Quoridor state
+        return State(
+            p1=state.p1,
+            p2=state.p2,
+            p1_numwalls=state.p1_numwalls,
+            p2_numwalls=state.p2_numwalls,
+            player=state.player,
+            h_walls=self._walls(state.h_walls),
+            v_walls=self._walls(state.v_walls)
+        )
+
+    def unpack(self, packed: PackedState) -> BitboardState:
+        return self.from_state(super().unpack(packed))
+
+    def _wall_mask(self, walls: int) -> int:
+        # Walls are already bitmasks over the same slots as PackedState keys
+        return walls
+
+    def _pawn_moves(self, mc: int, oc: int, blocked: int) -> list[Tuple[int, int]]:
+        # Same move order as Quoridor._get_pawn_moves: plain steps first, then hops
+        legal_pawn_moves = []
+        neighbors = self._neighbors[mc]
+        base = 4 * mc
+        for d, direction in enumerate(self.directions):
+            if not blocked >> (base + d) & 1 and neighbors[d] != oc:
+                legal_pawn_moves.append(direction)
+
+        for d in range(4):
+            if neighbors[d] == oc and not blocked >> (base + d) & 1:
+                if not blocked >> (4 * oc + d) & 1:
+                    legal_pawn_moves.append(self._hops[d])
+                else:
+                    for side, hop in self._diagonals[d]:
+                        if not blocked >> (4 * oc + side) & 1:
+                            legal_pawn_moves.append(hop)
+
+        return legal_pawn_moves
+
+    def _get_pawn_moves(self, state: BitboardState) -> list[Tuple[int, int]]:
+        me, opp = (state.p1, state.p2) if state.player == 1 else (state.p2, state.p1)
+        return self._pawn_moves(self._cell(me), self._cell(opp), state.blocked)
+
+    def _reaches_goal(self, start: int, goal: int, blocked: int) -> bool:
+        # Like Quoridor._path_exists_astar, A* over unblocked steps with a bucket per f = g + h, the
+        # other pawn never changes reachability. Each cell's four blocked bits pick its open steps at once.
+        n = self.size
+        open_steps = self._open
+        if start // n == goal:
+            return True
+        reached = bytearray(n * n)
+        reached[start] = 1
+        f = abs(goal - start // n)
+        buckets = [[] for _ in range(n * n + n)]
+        buckets[f].append(start)
+        for f in range(f, len(buckets)):
+            bucket = buckets[f]
+            while bucket:
+                cell = bucket.pop()
+                g = f - abs(goal - cell // n)
+                for s in open_steps[cell][blocked >> (4 * cell) & 15]:
+                    if not reached[s]:
+                        if s // n == goal:
+                            return True
+                        reached[s] = 1
+                        buckets[g + 1 + abs(goal - s // n)].append(s)
+        return False
+
+    def _path_exists(self, state: BitboardState, blocked: int) -> bool:
+        return self._reaches_goal(self._cell(state.p1), self.size-1, blocked) and self._reaches_goal(self._cell(state.p2), 0, blocked)
+
+    def _shortest_path_steps(self, start: int, goal: int, state: BitboardState) -> int | None:
+        # Like Quoridor._shortest_path_edges, a shortest path to the goal row as the blocked bits
+        # of the steps it takes, None if there is none, cached per wall configuration
+        key = (start, goal, state.h_walls, state.v_walls)
+        if key in self._path_cache:
+            return self._path_cache[key]
+
+        n = self.size
+        blocked = state.blocked
+        parents = [-1] * (n * n) # Bit 4 * cell + direction of the step that first reached each cell
+        parents[start] = 4 * start
+        frontier = [start]
+        steps = None
+        while frontier and steps is None:
+            next_frontier = []
+            for cell in frontier:
+                if cell // n == goal:
+                    steps = 0
+                    while cell != start:
+                        bit = parents[cell]
+                        steps |= 1 << bit
+                        cell = bit // 4 # The cell the step was taken from
+                    break
+                base = 4 * cell
+                for d, s in enumerate(self._neighbors[cell]):
+                    if not blocked >> (base + d) & 1 and parents[s] < 0:
+                        parents[s] = base + d
+                        next_frontier.append(s)
+            frontier = next_frontier
+
+        if len(self._path_cache) >= self.path_cache_size:
+            self._path_cache.clear()
+        self._path_cache[key] = steps
+        return steps
+
+    def _path_steps(self, state: BitboardState) -> int | None:
+        # Steps on the current shortest paths of both players, None if either player is already cut off
+        p1_steps = self._shortest_path_steps(self._cell(state.p1), self.size-1, state)
+        p2_steps = self._shortest_path_steps(self._cell(state.p2), 0, state)
+        if p1_steps is None or p2_steps is None:
+            return None
+        return p1_steps | p2_steps
+
+    def goal_distances(self, state: BitboardState, player: int) -> dict:
+        # Same as Quoridor.goal_distances, stepping through the precomputed neighbors
+        n = self.size
+        goal = n - 1 if player == 1 else 0
+        frontier = [goal * n + x for x in range(n)]
+        distances = {cell: 0 for cell in frontier}
+        while frontier:
+            next_frontier = []
+            for cell in frontier:
+                base = 4 * cell
+                for d, s in enumerate(self._neighbors[cell]):
+                    if not state.blocked >> (base + d) & 1 and s not in distances:
+                        distances[s] = distances[cell] + 1
+                        next_frontier.append(s)
+            frontier = next_frontier
+        return {(cell % n, cell // n): distance for cell, distance in distances.items()}
+
+    def _get_wall_placements(self, state: BitboardState, block: list[int], offset: int) -> list[Tuple[int, int]]:
+
+        legal_placements = []
+
+        if (state.p1_numwalls if state.player == 1 else state.p2_numwalls) <= 0:
+            return legal_placements
+
+        occupied = state.occupied >> offset
+        path_steps = self._path_steps(state)
+        for slot, candidate in self._slot_candidates:
+            if not occupied >> slot & 1:
+                # Walls that leave both cached paths intact cannot block either player
+                if path_steps is not None and not block[slot] & path_steps:
+                    legal_placements.append(candidate)
+                elif self._path_exists(state, state.blocked | block[slot]):
+                    legal_placements.append(candidate)
+
+        return legal_placements
+
+    def _get_h_wall_placements(self, state: BitboardState) -> list[Tuple[int, int]]:
+        return self._get_wall_placements(state, self._h_block, 0)
+
+    def _get_v_wall_placements(self, state: BitboardState) -> list[Tuple[int, int]]:
+        return self._get_wall_placements(state, self._v_block, self._num_slots)
+
+    def _wall_is_legal(self, state: BitboardState, action: Tuple[str, Tuple[int, int]]) -> bool:
+        move_type, (x, y) = action
+        slot = y * (self.size - 1) + x
+        if move_type == 'h_wall':
+            occupied, block = state.occupied >> slot & 1, self._h_block[slot]
+        else:
+            occupied, block = state.occupied >> (self._num_slots + slot) & 1, self._v_block[slot]
+        if occupied:
+            return False
+        path_steps = self._path_steps(state)
+        if path_steps is not None and not block & path_steps:
+            return True
+        return self._path_exists(state, state.blocked | block)
+
+    def _place_wall(self, h_walls: int, v_walls: int, blocked: int, occupied: int, move_type: str, slot: int) -> Tuple[int, int, int, int]:
+        if move_type == 'h_wall':
+            return h_walls | 1 << slot, v_walls, blocked | self._h_block[slot], occupied | self._h_conflicts[slot]
+        if move_type == 'v_wall':
+            return h_walls, v_walls | 1 << slot, blocked | self._v_block[slot], occupied | self._v_conflicts[slot]
+        raise ValueError('Invalid move type.')
+
+    def successor(self, state: BitboardState, action: Tuple[str, Any]) -> BitboardState:
+        move_type, move = action
+
+        # Move was a pawn move
+        if move_type == 'pawn':
+            return BitboardState(
+                p1=(state.p1[0]+move[0], state.p1[1]+move[1]) if state.player==1 else state.p1,
+                p2=(state.p2[0]+move[0], state.p2[1]+move[1]) if state.player==2 else state.p2,
+                p1_numwalls=state.p1_numwalls,
+                p2_numwalls=state.p2_numwalls,
+                player=1 if state.player==2 else 2, # Switch turns
+                h_walls=state.h_walls,
+                v_walls=state.v_walls,
+                blocked=state.blocked,
+                occupied=state.occupied
+            )
+
+        # Move was a wall placement
+        h_walls, v_walls, blocked, occupied = self._place_wall(
+            state.h_walls, state.v_walls, state.blocked, state.occupied, move_type, move[1] * (self.size - 1) + move[0]
+        )
+        return BitboardState(
+            p1=state.p1,
+            p2=state.p2,
+            p1_numwalls=state.p1_numwalls-1 if state.player==1 else state.p1_numwalls,
+            p2_numwalls=state.p2_numwalls-1 if state.player==2 else state.p2_numwalls,
+            player=1 if state.player==2 else 2, # Switch turns
+            h_walls=h_walls,
+            v_walls=v_walls,
+            blocked=blocked,
+            occupied=occupied
+        )
+
+    def zobrist_hash(self, state: BitboardState) -> int:
+        key = self._zobrist_pawns[(1, state.p1)] ^ self._zobrist_pawns[(2, state.p2)]
+        key ^= self._zobrist_numwalls[(1, state.p1_numwalls)] ^ self._zobrist_numwalls[(2, state.p2_numwalls)]
+        for slot, candidate in self._slot_candidates:
+            if state.h_walls >> slot & 1:
+                key ^= self._zobrist_walls[('h_wall', candidate)]
+            if state.v_walls >> slot & 1:
+                key ^= self._zobrist_walls[('v_wall', candidate)]
+        if state.player == 2:
+            key ^= self._zobrist_player
+        return key
+
+    def visualize(self, state: BitboardState) -> None:
+        super().visualize(self.to_state(state))
@@ -0,0 +1,129 @@
+from typing import Tuple
+
+
+class GridGraph:
+    # Squares of a Quoridor board and the steps between them that no wall blocks. Squares are
+    # numbered y * size + x, and an adjacency lists for every square the squares one step away,
+    # in the order of directions. Placing a wall copies the adjacency with the wall's two edges
+    # removed, so path queries never look at the walls themselves, the pawns or the move rules.
+    # Searches mark visited squares in a bytearray and, as every step costs 1, order A* with
+    # a bucket per f value instead of a heap.
+    def __init__(self, size: int, directions: list[Tuple[int, int]]) -> None:
+        self.size = size
+        self.num_cells = size * size
+        self.squares = [(cell % size, cell // size) for cell in range(self.num_cells)]
+        self.empty = []
+        for x, y in self.squares:
+            self.empty.append(tuple(
+                (y+dy) * size + x+dx for dx, dy in directions if 0 <= x+dx < size and 0 <= y+dy < size
+            ))
+
+    def cell(self, square: Tuple[int, int]) -> int:
+        return square[1] * self.size + square[0]
+
+    def adjacency(self, wall_edges: list[frozenset]) -> list[Tuple[int, ...]]:
+        # Adjacency of a board with walls cutting the given edges, built from the empty board
+        adjacency = list(self.empty)
+        for edges in wall_edges:
+            self._cut(adjacency, edges)
+        return adjacency
+
+    def place(self, adjacency: list[Tuple[int, ...]], edges: frozenset) -> list[Tuple[int, ...]]:
+        # Adjacency after a wall cuts edges, the given one is left untouched
+        adjacency = list(adjacency)
+        self._cut(adjacency, edges)
+        return adjacency
+
+    def _cut(self, adjacency: list[Tuple[int, ...]], edges: frozenset) -> None:
+        for a, b in edges:
+            a, b = self.cell(a), self.cell(b)
+            adjacency[a] = tuple(s for s in adjacency[a] if s != b)
+            adjacency[b] = tuple(s for s in adjacency[b] if s != a)
+
+    def reaches(self, adjacency: list[Tuple[int, ...]], start: Tuple[int, int], goal: int) -> bool:
+        # Depth-first search for any square of the goal row
+        if start[1] == goal:
+            return True
+        low, high = goal * self.size, (goal + 1) * self.size # Cells of the goal row
+        node = self.cell(start)
+        reached = bytearray(self.num_cells)
+        reached[node] = 1
+        frontier = [node]
+        while frontier:
+            for s in adjacency[frontier.pop()]:
+                if not reached[s]:
+                    if low <= s < high:
+                        return True
+                    reached[s] = 1
+                    frontier.append(s)
+        return False
+
+    def reaches_astar(self, adjacency: list[Tuple[int, ...]], start: Tuple[int, int], goal: int) -> bool:
+        # A* toward the goal row, the row distance never overestimates the steps left.
+        # A step changes f = g + h by 0, 1 or 2, so buckets[f] are visited in increasing f.
+        if start[1] == goal:
+            return True
+        n = self.size
+        low, high = goal * n, (goal + 1) * n
+        node = self.cell(start)
+        reached = bytearray(self.num_cells)
+        reached[node] = 1
+        f = abs(goal - start[1])
+        buckets = [[] for _ in range(self.num_cells + n)]
+        buckets[f].append(node)
+        for f in range(f, len(buckets)):
+            bucket = buckets[f]
+            while bucket:
+                node = bucket.pop()
+                g = f - abs(goal - node // n)
+                for s in adjacency[node]:
+                    if not reached[s]:
+                        if low <= s < high:
+                            return True
+                        reached[s] = 1
+                        buckets[g + 1 + abs(goal - s // n)].append(s)
+        return False
+
+    def shortest_path_edges(self, adjacency: list[Tuple[int, ...]], start: Tuple[int, int], goal: int) -> frozenset | None:
+        # BFS for a shortest path to the goal row, returned as the set of edges it uses, None if there is none
+        low, high = goal * self.size, (goal + 1) * self.size
+        node = self.cell(start)
+        parents = [-1] * self.num_cells
+        parents[node] = node
+        frontier = [node]
+        while frontier:
+            next_frontier = []
+            for node in frontier:
+                if low <= node < high:
+                    edges = []
+                    while parents[node] != node:
+                        a, b = self.squares[node], self.squares[parents[node]]
+                        edges.append((min(a, b), max(a, b)))
+                        node = parents[node]
+                    return frozenset(edges)
+                for s in adjacency[node]:
+                    if parents[s] < 0:
+                        parents[s] = node
+                        next_frontier.append(s)
+            frontier = next_frontier
+        return None
+
+    def distances(self, adjacency: list[Tuple[int, ...]], goal: int) -> dict:
+        # Steps from every square that can reach the goal row, found by BFS back from the goal row
+        frontier = list(range(goal * self.size, (goal + 1) * self.size))
+        reached = bytearray(self.num_cells)
+        for node in frontier:
+            reached[node] = 1
+        distances = {self.squares[node]: 0 for node in frontier}
+        d = 0
+        while frontier:
+            d += 1
+            next_frontier = []
+            for node in frontier:
+                for s in adjacency[node]:
+                    if not reached[s]:
+                        reached[s] = 1
+                        distances[self.squares[s]] = d
+                        next_frontier.append(s)
+            frontier = next_frontier
+        return distances
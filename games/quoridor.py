@@ -1,8 +1,8 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Tuple, Any
 from games.base import AdversarialGame
+from games.graph import GridGraph
 import random
-from heapq import heappush, heappop
 
 
 @dataclass(frozen=True)
@@ -15,11 +15,39 @@ class State:
     player: int 
     h_walls: frozenset
     v_walls: frozenset
+    blocked_slots: frozenset = field(default=None, compare=False, repr=False) # Wall slots no longer available
+    adjacency: list = field(default=None, compare=False, repr=False) # GridGraph adjacency of the walls
 
     def __lt__(self, other) -> bool: # To prevent errors later
         return True
 
 
+class PackedState:
+    # Quoridor state packed into one int by Quoridor.pack, Quoridor.unpack gives the State back.
+    # Hashing and comparing it costs the same as for an int, however many walls are on the board.
+    # It is meant for tables that store many whole states; the caches in the tree key on the walls
+    # alone (ints already for BitboardQuoridor) or on Zobrist hashes, and packing would only add work.
+    __slots__ = ('key', '_hash')
+
+    def __init__(self, key: int) -> None:
+        self.key = key
+        self._hash = hash(key)
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not PackedState:
+            return NotImplemented
+        return self.key == other.key
+
+    def __lt__(self, other) -> bool:
+        return self.key < other.key
+
+    def __repr__(self) -> str:
+        return f'PackedState({self.key:#x})'
+
+
 class Quoridor(AdversarialGame):
     def __init__(self, size=5, numwalls=3) -> None:
         self.size = size
@@ -32,6 +60,49 @@ class Quoridor(AdversarialGame):
             (i, j) for i in range(self.size - 1) for j in range(self.size - 1)
         ]
 
+        # Precompute the wall slots each wall placement overlaps or crosses, including its own
+        self.wall_conflicts = {}
+        for (x, y) in self.wall_placement_candidates:
+            self.wall_conflicts[('h_wall', (x, y))] = frozenset(
+                [('h_wall', (x, y)), ('v_wall', (x, y))]
+                + [('h_wall', (i, y)) for i in [x-1, x+1] if 0 <= i < self.size - 1]
+            )
+            self.wall_conflicts[('v_wall', (x, y))] = frozenset(
+                [('v_wall', (x, y)), ('h_wall', (x, y))]
+                + [('v_wall', (x, j)) for j in [y-1, y+1] if 0 <= j < self.size - 1]
+            )
+
+        # Precompute the board edges each wall placement cuts
+        self.wall_edges = {}
+        for (x, y) in self.wall_placement_candidates:
+            self.wall_edges[('h_wall', (x, y))] = frozenset([((x, y), (x, y+1)), ((x+1, y), (x+1, y+1))])
+            self.wall_edges[('v_wall', (x, y))] = frozenset([((x, y), (x+1, y)), ((x, y+1), (x+1, y+1))])
+
+        # Zobrist keys for pawn squares, remaining walls, wall slots and the side to move.
+        # Seeded so every process builds the same keys.
+        rng = random.Random(0)
+        self._zobrist_pawns = {
+            (player, (x, y)): rng.getrandbits(64) for player in [1, 2] for x in range(self.size) for y in range(self.size)
+        }
+        self._zobrist_numwalls = {
+            (player, n): rng.getrandbits(64) for player in [1, 2] for n in range(self.numwalls + 1)
+        }
+        self._zobrist_walls = {slot: rng.getrandbits(64) for slot in self.wall_conflicts}
+        self._zobrist_player = rng.getrandbits(64)
+
+        # Bit layout of PackedState keys, lowest bits first: h_walls and v_walls by slot y * (size - 1) + x,
+        # the squares y * size + x of both pawns, the walls left to both players and the player to move
+        self._slot_bits = (self.size - 1) ** 2
+        self._cell_bits = (self.size * self.size - 1).bit_length()
+        self._numwall_bits = self.numwalls.bit_length()
+
+        # Open steps between squares, for every path query
+        self.graph = GridGraph(self.size, self.directions)
+
+        # Shortest path edges per wall configuration, so walls off both paths skip the path search
+        self.path_cache_size = 10000
+        self._path_cache = {}
+
     def start_state(self) -> State:
         mid = self.size // 2
         return State(
@@ -41,7 +112,9 @@ class Quoridor(AdversarialGame):
             p2_numwalls=self.numwalls,
             player=1,
             h_walls=frozenset(),
-            v_walls=frozenset()
+            v_walls=frozenset(),
+            blocked_slots=frozenset(),
+            adjacency=self.graph.empty
         )
     
     def is_end(self, state: State) -> bool:
@@ -88,86 +161,39 @@ class Quoridor(AdversarialGame):
 
         return False
     
-    def _path_exists_bfs(self, p1: Tuple[int, int], p2: Tuple[int, int], h_walls: list[Tuple[int, int]], v_walls: list[Tuple[int, int]]) -> bool:
-        # Implement BFS to ensure at least 1 path exists to the goal
-        def _bfs(start: Tuple[int, int], goal: int, player: int) -> bool:
-            node = start
-            if node[1] == goal:
-                return True
-            frontier = [node]
-            reached = [node]
-            while len(frontier) > 0:
-                node = frontier.pop()
-                # Get children
-                state = State(
-                    p1=node if player==1 else p2,
-                    p2=node if player==2 else p1,
-                    p1_numwalls=0,
-                    p2_numwalls=0,
-                    player=player,
-                    h_walls=h_walls,
-                    v_walls=v_walls
-                )
-                actions = self.actions(state)
-                for action in actions:
-                    successor = self.successor(state, action)
-                    s = successor.p1 if player==1 else successor.p2
-                    if s[1] == goal:
-                        return True
-                    if s not in reached:
-                        reached.append(s)
-                        frontier.append(s)
-            return False
-        
-        # If there's a path for both players, then return true, otherwise false
-        if _bfs(p1, self.size-1, 1) and _bfs(p2, 0, 2):
-            return True 
-        
-        return False
+    def _path_exists_bfs(self, p1: Tuple[int, int], p2: Tuple[int, int], adjacency: list) -> bool:
+        # Search the open steps to ensure at least 1 path exists to the goal for both players.
+        # The other pawn never changes whether the goal can be reached, it can always be hopped or passed.
+        return self.graph.reaches(adjacency, p1, self.size-1) and self.graph.reaches(adjacency, p2, 0)
     
-    def _path_exists_astar(self, p1: Tuple[int, int], p2: Tuple[int, int], h_walls: list[Tuple[int, int]], v_walls: list[Tuple[int, int]]) -> bool:
-        # Implement BFS to ensure at least 1 path exists to the goal
-        def _astar(start: Tuple[int, int], goal: int, player: int) -> bool:
-            node = start
-            if node[1] == goal:
-                return True
-            frontier = []
-            heappush(frontier, (0, node))
-            reached = [node]
-            while len(frontier) > 0:
-                g, node = heappop(frontier)
-                # Get children
-                state = State(
-                    p1=node if player==1 else p2,
-                    p2=node if player==2 else p1,
-                    p1_numwalls=0,
-                    p2_numwalls=0,
-                    player=player,
-                    h_walls=h_walls,
-                    v_walls=v_walls
-                )
-                actions = self.actions(state)
-                for action in actions:
-                    successor = self.successor(state, action)
-                    s = successor.p1 if player==1 else successor.p2
-                    if s[1] == goal:
-                        return True
-                    if s not in reached:
-                        reached.append(s)
-                        h = _heuristic(s, goal)
-                        heappush(frontier, (g + 1 + h, s))
-
-            return False
-        
-        def _heuristic(start: Tuple[int, int], goal: int) -> int:
-            return abs(goal - start[1])
-        
-        # If there's a path for both players, then return true, otherwise false
-        if _astar(p1, self.size-1, 1) and _astar(p2, 0, 2):
-            return True 
-        
-        return False
+    def _path_exists_astar(self, p1: Tuple[int, int], p2: Tuple[int, int], adjacency: list) -> bool:
+        # Same as _path_exists_bfs, with A* toward the goal rows
+        return self.graph.reaches_astar(adjacency, p1, self.size-1) and self.graph.reaches_astar(adjacency, p2, 0)
         
+    def _shortest_path_edges(self, start: Tuple[int, int], goal: int, state: State) -> frozenset | None:
+        # Shortest path to the goal row as the set of edges it uses, cached per wall configuration
+        key = (start, goal, state.h_walls, state.v_walls)
+        if key in self._path_cache:
+            return self._path_cache[key]
+
+        edges = self.graph.shortest_path_edges(self._adjacency(state), start, goal)
+        if len(self._path_cache) >= self.path_cache_size:
+            self._path_cache.clear()
+        self._path_cache[key] = edges
+        return edges
+
+    def _path_edges(self, state: State) -> frozenset | None:
+        # Edges on the current shortest paths of both players, None if either player is already cut off
+        p1_edges = self._shortest_path_edges(state.p1, self.size-1, state)
+        p2_edges = self._shortest_path_edges(state.p2, 0, state)
+        if p1_edges is None or p2_edges is None:
+            return None
+        return p1_edges | p2_edges
+
+    def goal_distances(self, state: State, player: int) -> dict:
+        # Steps from every reachable square to the player's goal row, found by BFS back from the goal row
+        return self.graph.distances(self._adjacency(state), self.size - 1 if player == 1 else 0)
+
     def _in_bounds(self, p: Tuple[int, int]) -> bool:
         if p[0] < self.size and p[0] >= 0:
             if p[1] < self.size and p[1] >= 0:
@@ -225,6 +251,25 @@ class Quoridor(AdversarialGame):
 
         return legal_pawn_moves
     
+    def _blocked_slots(self, state: State) -> frozenset:
+        # States built by hand may not carry their blocked slots, so derive them from the walls
+        if state.blocked_slots is not None:
+            return state.blocked_slots
+        blocked_slots = frozenset()
+        for wall in state.h_walls:
+            blocked_slots |= self.wall_conflicts[('h_wall', wall)]
+        for wall in state.v_walls:
+            blocked_slots |= self.wall_conflicts[('v_wall', wall)]
+        return blocked_slots
+
+    def _adjacency(self, state: State) -> list:
+        # Same for the adjacency, successor cuts the edges of each wall as it is placed
+        if state.adjacency is not None:
+            return state.adjacency
+        wall_edges = [self.wall_edges[('h_wall', wall)] for wall in state.h_walls]
+        wall_edges += [self.wall_edges[('v_wall', wall)] for wall in state.v_walls]
+        return self.graph.adjacency(wall_edges)
+
     def _get_h_wall_placements(self, state: State) -> list[Tuple[int, int]]:
         
         legal_placements = []
@@ -237,14 +282,17 @@ class Quoridor(AdversarialGame):
             if state.p2_numwalls <= 0:
                 return legal_placements
 
+        blocked_slots = self._blocked_slots(state)
+        path_edges = self._path_edges(state)
         for candidate in self.wall_placement_candidates:
-            if candidate not in state.h_walls:
-                if candidate not in [(wall[0]+1, wall[1]) for wall in state.h_walls]:
-                    if candidate not in [(wall[0]-1, wall[1]) for wall in state.h_walls]:
-                        if candidate not in state.v_walls:
-                            successor = self.successor(state, ('h_wall', candidate))
-                            if self._path_exists_astar(successor.p1, successor.p2, successor.h_walls, successor.v_walls):
-                                legal_placements.append(candidate)
+            if ('h_wall', candidate) not in blocked_slots:
+                # Walls that leave both cached paths intact cannot block either player
+                if path_edges is not None and self.wall_edges[('h_wall', candidate)].isdisjoint(path_edges):
+                    legal_placements.append(candidate)
+                    continue
+                successor = self.successor(state, ('h_wall', candidate))
+                if self._path_exists_astar(successor.p1, successor.p2, successor.adjacency):
+                    legal_placements.append(candidate)
 
         return legal_placements
     
@@ -260,14 +308,17 @@ class Quoridor(AdversarialGame):
             if state.p2_numwalls <= 0:
                 return legal_placements
 
+        blocked_slots = self._blocked_slots(state)
+        path_edges = self._path_edges(state)
         for candidate in self.wall_placement_candidates:
-            if candidate not in state.v_walls:
-                if candidate not in [(wall[0], wall[1]+1) for wall in state.v_walls]:
-                    if candidate not in [(wall[0], wall[1]-1) for wall in state.v_walls]:
-                        if candidate not in state.h_walls:
-                            successor = self.successor(state, ('v_wall', candidate))
-                            if self._path_exists_astar(successor.p1, successor.p2, successor.h_walls, successor.v_walls):
-                                legal_placements.append(candidate)
+            if ('v_wall', candidate) not in blocked_slots:
+                # Walls that leave both cached paths intact cannot block either player
+                if path_edges is not None and self.wall_edges[('v_wall', candidate)].isdisjoint(path_edges):
+                    legal_placements.append(candidate)
+                    continue
+                successor = self.successor(state, ('v_wall', candidate))
+                if self._path_exists_astar(successor.p1, successor.p2, successor.adjacency):
+                    legal_placements.append(candidate)
 
         return legal_placements  
 
@@ -290,6 +341,55 @@ class Quoridor(AdversarialGame):
             actions.append(('v_wall', v_wall_placement))
 
         return actions
+
+    def _wall_is_legal(self, state: State, action: Tuple[str, Tuple[int, int]]) -> bool:
+        # The test _get_h_wall_placements and _get_v_wall_placements apply to every candidate
+        if action in self._blocked_slots(state):
+            return False
+        path_edges = self._path_edges(state)
+        if path_edges is not None and self.wall_edges[action].isdisjoint(path_edges):
+            return True
+        successor = self.successor(state, action)
+        return self._path_exists_astar(successor.p1, successor.p2, successor.adjacency)
+
+    def is_legal(self, state: State, action: Tuple[str, Any]) -> bool:
+        # Checks a single action without generating the others
+        move_type, move = action
+        if move_type == 'pawn':
+            return move in self._get_pawn_moves(state)
+        if (state.p1_numwalls if self.player(state) == 1 else state.p2_numwalls) <= 0:
+            return False
+        return action in self.wall_conflicts and self._wall_is_legal(state, action)
+
+    def random_action(self, state: State, walls: bool = True, rng: Any = random) -> Tuple[str, Any]:
+        # Same distribution as rng.choice(self.actions(state)), or over the pawn moves only if not walls.
+        # Draws from the pawn moves and every wall slot, so only a drawn wall is checked and illegal ones are redrawn.
+        pawn_moves = self._get_pawn_moves(state)
+        num_slots = len(self.wall_placement_candidates)
+        if not walls or (state.p1_numwalls if self.player(state) == 1 else state.p2_numwalls) <= 0:
+            return ('pawn', rng.choice(pawn_moves))
+
+        num_candidates = len(pawn_moves) + 2 * num_slots
+        for _ in range(num_candidates):
+            i = rng.randrange(num_candidates)
+            if i < len(pawn_moves):
+                return ('pawn', pawn_moves[i])
+            i -= len(pawn_moves)
+            action = ('h_wall' if i < num_slots else 'v_wall', self.wall_placement_candidates[i % num_slots])
+            if self._wall_is_legal(state, action):
+                return action
+
+        # Nearly every slot is taken, choose from the full list instead
+        return rng.choice(self.actions(state))
+
+    def playout(self, state: State, depth: int, policy: Any = None, rng: Any = random) -> Tuple[State, int]:
+        # Plays up to depth moves, chosen by policy or uniformly at random, and returns the final state and the moves played
+        d = 0
+        while not self.is_end(state) and d < depth:
+            action = policy(state) if policy else self.random_action(state, rng=rng)
+            state = self.successor(state, action)
+            d += 1
+        return state, d
     
     def successor(self, state: State, action: Tuple[str, Any]) -> State:
         move_type, move = action
@@ -303,7 +403,9 @@ class Quoridor(AdversarialGame):
                 p1_numwalls=state.p1_numwalls,
                 p2_numwalls=state.p2_numwalls,
                 h_walls=state.h_walls,
-                v_walls=state.v_walls
+                v_walls=state.v_walls,
+                blocked_slots=state.blocked_slots,
+                adjacency=state.adjacency
             )
         
         # Move was a h_wall placement
@@ -317,7 +419,9 @@ class Quoridor(AdversarialGame):
                 p1_numwalls=state.p1_numwalls-1 if self.player(state)==1 else state.p1_numwalls,
                 p2_numwalls=state.p2_numwalls-1 if self.player(state)==2 else state.p2_numwalls,
                 h_walls=frozenset(h_walls),
-                v_walls=state.v_walls
+                v_walls=state.v_walls,
+                blocked_slots=self._blocked_slots(state) | self.wall_conflicts[action],
+                adjacency=self.graph.place(self._adjacency(state), self.wall_edges[action])
             )
         
         # Move was a v_wall placement
@@ -331,7 +435,9 @@ class Quoridor(AdversarialGame):
                 p1_numwalls=state.p1_numwalls-1 if self.player(state)==1 else state.p1_numwalls,
                 p2_numwalls=state.p2_numwalls-1 if self.player(state)==2 else state.p2_numwalls,
                 h_walls=state.h_walls,
-                v_walls=frozenset(v_walls)
+                v_walls=frozenset(v_walls),
+                blocked_slots=self._blocked_slots(state) | self.wall_conflicts[action],
+                adjacency=self.graph.place(self._adjacency(state), self.wall_edges[action])
             )
         
         # Unknown move type
@@ -340,7 +446,71 @@ class Quoridor(AdversarialGame):
         
     def player(self, state: State) -> int:
         return state.player
+
+    def zobrist_hash(self, state: State) -> int:
+        key = self._zobrist_pawns[(1, state.p1)] ^ self._zobrist_pawns[(2, state.p2)]
+        key ^= self._zobrist_numwalls[(1, state.p1_numwalls)] ^ self._zobrist_numwalls[(2, state.p2_numwalls)]
+        for wall in state.h_walls:
+            key ^= self._zobrist_walls[('h_wall', wall)]
+        for wall in state.v_walls:
+            key ^= self._zobrist_walls[('v_wall', wall)]
+        if state.player == 2:
+            key ^= self._zobrist_player
+        return key
+
+    def zobrist_update(self, key: int, state: State, action: Tuple[str, Any]) -> int:
+        # Hash of successor(state, action) computed from the hash of state
+        move_type, move = action
+        player = state.player
+        if move_type == 'pawn':
+            pawn = state.p1 if player == 1 else state.p2
+            key ^= self._zobrist_pawns[(player, pawn)] ^ self._zobrist_pawns[(player, (pawn[0]+move[0], pawn[1]+move[1]))]
+        else:
+            numwalls = state.p1_numwalls if player == 1 else state.p2_numwalls
+            key ^= self._zobrist_numwalls[(player, numwalls)] ^ self._zobrist_numwalls[(player, numwalls-1)]
+            key ^= self._zobrist_walls[action]
+        return key ^ self._zobrist_player
         
+    def pack(self, state: State) -> PackedState:
+        n = self.size
+        key = state.player - 1
+        for numwalls in [state.p2_numwalls, state.p1_numwalls]:
+            key = key << self._numwall_bits | numwalls
+        for pawn in [state.p2, state.p1]:
+            key = key << self._cell_bits | pawn[1] * n + pawn[0]
+        key = key << self._slot_bits | self._wall_mask(state.v_walls)
+        key = key << self._slot_bits | self._wall_mask(state.h_walls)
+        return PackedState(key)
+
+    def unpack(self, packed: PackedState) -> State:
+        # Blocked slots and adjacency are derived again from the walls when first needed
+        n, key = self.size, packed.key
+        fields = []
+        for bits in [self._slot_bits, self._slot_bits, self._cell_bits, self._cell_bits, self._numwall_bits, self._numwall_bits]:
+            fields.append(key & ((1 << bits) - 1))
+            key >>= bits
+        h_walls, v_walls, p1, p2, p1_numwalls, p2_numwalls = fields
+        return State(
+            p1=(p1 % n, p1 // n),
+            p2=(p2 % n, p2 // n),
+            p1_numwalls=p1_numwalls,
+            p2_numwalls=p2_numwalls,
+            player=key + 1,
+            h_walls=self._walls(h_walls),
+            v_walls=self._walls(v_walls)
+        )
+
+    def _wall_mask(self, walls: frozenset) -> int:
+        m = self.size - 1
+        mask = 0
+        for (x, y) in walls:
+            mask |= 1 << (y * m + x)
+        return mask
+
+    def _walls(self, mask: int) -> frozenset:
+        m = self.size - 1
+        return frozenset((slot % m, slot // m) for slot in range(m * m) if mask >> slot & 1)
+
     def visualize(self, state: State) -> None:
 
         for y in reversed(range(self.size)):
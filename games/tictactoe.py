@@ -1,6 +1,7 @@
 from games.base import AdversarialGame
 from typing import Tuple, Any
 from dataclasses import dataclass
+import random
 
 
 @dataclass(frozen=True)
@@ -17,6 +18,11 @@ class TicTacToe(AdversarialGame):
         self.diags = [[1, 5, 9], [7, 5, 3]]
         self.win_bonus = 1
 
+        # Zobrist keys for every mark on every square and for the side to move
+        rng = random.Random(0)
+        self._zobrist_marks = {(move, mark): rng.getrandbits(64) for move in self.possible_moves for mark in ['X', 'O']}
+        self._zobrist_player = rng.getrandbits(64)
+
     def start_state(self) -> TTCState:
         board = {
             1: None, 2: None, 3: None, 
@@ -67,6 +73,17 @@ class TicTacToe(AdversarialGame):
             return -self.win_bonus if player == 1 else self.win_bonus
         return 0        
     
+    def zobrist_hash(self, state: TTCState) -> int:
+        key = self._zobrist_player if state.player == 2 else 0
+        for move in self.possible_moves:
+            if state.board[move] is not None:
+                key ^= self._zobrist_marks[(move, state.board[move])]
+        return key
+
+    def zobrist_update(self, key: int, state: TTCState, action: int) -> int:
+        mark = 'X' if state.player == 1 else 'O'
+        return key ^ self._zobrist_marks[(action, mark)] ^ self._zobrist_player
+
     def visualize(self, state: TTCState) -> None:
         for row in self.rows:
             row_print = ''
@@ -0,0 +1,229 @@
+from experiment import Quoridor, BitboardQuoridor, TicTacToe, play_trial, game_record
+from records import GameRecordWriter
+from profiling import write_profile
+from utils import initialize_parser
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Tuple
+import argparse
+import math
+import multiprocessing
+import random
+import shlex
+import sys
+import time
+
+
+def elo(score: float) -> float:
+    # Elo difference that makes score the expected result per game
+    if score <= 0 or score >= 1:
+        return math.copysign(float('inf'), score - 0.5)
+    return -400 * math.log10(1 / score - 1)
+
+
+def expected_score(elo: float) -> float:
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def sprt_bounds(alpha: float, beta: float) -> Tuple[float, float]:
+    # LLR below the lower bound accepts H0, above the upper bound accepts H1
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+def sprt_llr(wins: int, draws: int, losses: int, elo0: float, elo1: float) -> float:
+    # Log-likelihood ratio of H1: elo = elo1 against H0: elo = elo0, from the normal
+    # approximation of the mean score per game. The variance adds half a game of every outcome, so
+    # that a streak of wins or losses, which has none, still decides the test.
+    games = wins + draws + losses
+    if games == 0:
+        return 0
+    score = (wins + draws / 2) / games
+    padded = games + 1.5
+    variance = (wins + 0.5 + (draws + 0.5) / 4) / padded - ((wins + 0.5 + (draws + 0.5) / 2) / padded) ** 2
+    s0, s1 = expected_score(elo0), expected_score(elo1)
+    return (s1 - s0) * (2 * score - s0 - s1) / (2 * variance / games)
+
+
+class Match:
+    # SPRT between --p1 and the --p2 configuration of one gauntlet entry, scored from --p1's side
+    def __init__(self, name: str, args: argparse.Namespace) -> None:
+        self.name = name
+        self.args = args
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+        self.scheduled = 0 # Games handed out, including those still being played
+        self.finished = {} # Results of games that ended before an earlier game, by index
+        self.result = None # 'H0' or 'H1' once the test has decided
+
+    def games(self) -> int:
+        return self.wins + self.draws + self.losses
+
+    def add(self, score: float) -> None:
+        if score == 1:
+            self.wins += 1
+        elif score == 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+        llr = self.llr()
+        lower, upper = sprt_bounds(self.args.alpha, self.args.beta)
+        if llr <= lower:
+            self.result = 'H0'
+        elif llr >= upper:
+            self.result = 'H1'
+
+    def finish(self, result: Tuple) -> list[Tuple]:
+        # Takes the play_trial result of a game that ended, returns the results that now count: those
+        # of the next games in the order they were handed out, up to the first one still running.
+        # Results after the game that decides the test do not count.
+        self.finished[result[0]] = result
+        counted = []
+        while self.result is None and self.games() in self.finished:
+            result = self.finished.pop(self.games())
+            self.add(result[2])
+            counted.append(result)
+        return counted
+
+    def llr(self) -> float:
+        return sprt_llr(self.wins, self.draws, self.losses, self.args.elo0, self.args.elo1)
+
+    def elo(self) -> Tuple[float, float]:
+        # Elo estimate of --p1 with the half width of its 95% confidence interval
+        games = self.games()
+        score = (self.wins + self.draws / 2) / games
+        deviation = math.sqrt(max((self.wins + self.draws / 4) / games - score ** 2, 0) / games)
+        low, high = elo(max(score - 1.96 * deviation, 0)), elo(min(score + 1.96 * deviation, 1))
+        if math.isinf(low) or math.isinf(high):
+            return elo(score), float('inf')
+        return elo(score), (high - low) / 2
+
+    def open(self) -> bool:
+        return self.result is None and self.scheduled < self.args.max_games
+
+    def summary(self) -> str:
+        estimate, margin = self.elo() if self.games() else (0, float('inf'))
+        verdict = {'H1': f'{self.args.p1} is stronger', 'H0': f'{self.args.p1} is not stronger', None: 'undecided'}[self.result]
+        return f'{self.name}: {self.games()} games, +{self.wins} ={self.draws} -{self.losses}, ' \
+               f'Elo {estimate:+.1f} +/- {margin:.1f}, LLR {self.llr():.2f}, {verdict}.'
+
+
+# Per-process games of match workers
+_worker_games = {}
+
+
+def match_seed(seed: int, match: Match) -> str:
+    # Seed of the games of one match, so the matches of a gauntlet do not share their random numbers
+    return f'{seed}:{match.name}'
+
+
+def _play_match_game(args: argparse.Namespace, index: int, seed: str) -> Tuple[int, bool, float, int, list[float], list[float], list[dict]]:
+    key = (args.g, args.s, args.w)
+    if key not in _worker_games:
+        _worker_games[key] = globals()[args.g](size=args.s, numwalls=args.w)
+    return play_trial(args, _worker_games[key], index, seed, alternate=True)
+
+
+def run(matches: list[Match], jobs: int, seed: int, writer: GameRecordWriter = None, verbose: bool = False, profiled: list = None) -> None:
+    # Plays the games of all matches on one pool, handing the next game to the open match with the
+    # fewest games so far. Colors alternate, and a match stops taking games as soon as it is decided.
+    # Results count in the order the games were handed out, not the order they end, so short games
+    # are not favored when the test decides early; games of a decided match still running are dropped.
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=context) as pool:
+        running = {}
+
+        def fill() -> None:
+            while len(running) < 2 * jobs:
+                candidates = [match for match in matches if match.open()]
+                if not candidates:
+                    return
+                match = min(candidates, key=lambda match: match.scheduled)
+                future = pool.submit(_play_match_game, match.args, match.scheduled, match_seed(seed, match))
+                running[future] = match
+                match.scheduled += 1
+
+        fill()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                match = running.pop(future)
+                if match.result is not None:
+                    continue
+                for index, swapped, score, moves, _, _, history in match.finish(future.result()):
+                    if writer:
+                        writer.write({**game_record(match.args, index, f'{match_seed(seed, match)}:{index}', swapped, score, history), 'match': match.name})
+                    if profiled is not None:
+                        profiled.append((index, swapped, history))
+                    if verbose and (match.result is not None or match.games() % 10 == 0):
+                        print(match.summary())
+            for future, match in list(running.items()):
+                if match.result is not None and future.cancel():
+                    del running[future]
+            fill()
+
+
+def match_parser() -> argparse.ArgumentParser:
+    # The flags of experiment.py and play.py, with the settings of the test
+    parser = initialize_parser()
+    parser.add_argument('--elo0', type=float,
+                        help='Elo difference of the null hypothesis, that player 1 is not stronger.',
+                        default=0
+    )
+    parser.add_argument('--elo1', type=float,
+                        help='Elo difference of the alternative hypothesis, that player 1 is stronger.',
+                        default=50
+    )
+    parser.add_argument('--alpha', type=float,
+                        help='Probability of accepting elo1 when elo0 holds.',
+                        default=0.05
+    )
+    parser.add_argument('--beta', type=float,
+                        help='Probability of accepting elo0 when elo1 holds.',
+                        default=0.05
+    )
+    parser.add_argument('--max_games', type=int,
+                        help='Games after which a match stops undecided.',
+                        default=2000
+    )
+    parser.add_argument('--gauntlet', type=str, nargs='+',
+                        help='Player 2 configurations to test player 1 against, each a quoted list of flags '
+                             'overriding the command line, e.g. "--p2_rollouts 50" "--p2 QuoridorAlphaBetaAgent".',
+                        default=['']
+    )
+    return parser
+
+
+def main():
+    parser = match_parser()
+    args = parser.parse_args()
+    if args.elo1 <= args.elo0:
+        raise ValueError('Please enter an elo1 above elo0.')
+
+    # Every gauntlet entry is parsed on top of the command line, so its flags win
+    matches = []
+    for entry in args.gauntlet:
+        match_args = parser.parse_args(sys.argv[1:] + shlex.split(entry))
+        matches.append(Match(entry or args.p2, match_args))
+
+    seed = args.seed if args.seed is not None else random.getrandbits(32)
+    start = time.time()
+    writer = GameRecordWriter(args.record) if args.record else None
+    if writer:
+        writer.write({'type': 'run', 'args': vars(args), 'seed': seed, 'started': start})
+    profiled = [] if args.profile else None
+    run(matches, max(args.jobs, 1), seed, writer, args.verbose, profiled)
+    if writer:
+        writer.close()
+    if args.profile:
+        write_profile(args.profile, profiled, args.profile_format)
+
+    lower, upper = sprt_bounds(args.alpha, args.beta)
+    print(f'SPRT elo0={args.elo0} elo1={args.elo1} alpha={args.alpha} beta={args.beta}, LLR bounds [{lower:.2f}, {upper:.2f}]:')
+    for match in matches:
+        print(f'\t{match.summary()}')
+    played = sum(match.games() for match in matches)
+    print(f'\t{played} games played out of at most {len(matches) * args.max_games}, in {round(time.time() - start, 2)} seconds.')
+
+
+if __name__ == '__main__':
+    main()
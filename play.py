@@ -1,14 +1,24 @@
 from games.quoridor import Quoridor
+from games.bitboard import BitboardQuoridor
 from games.tictactoe import TicTacToe
 from agents.random import RandomAgent
 from agents.human import HumanAgent
-from agents.mcts import MCTSAgent, QuoridorMCTSAgent
-from agents.minmax import QuoridorAlphaBetaAgent, AlphaBetaAgent
+from agents.mcts import MCTSAgent, QuoridorMCTSAgent, TreeParallelMCTSAgent, QuoridorTreeParallelMCTSAgent
+from agents.array_mcts import ArrayMCTSAgent, QuoridorArrayMCTSAgent
+from agents.minmax import QuoridorAlphaBetaAgent, AlphaBetaAgent, ParallelAlphaBetaAgent, QuoridorParallelAlphaBetaAgent
 from utils import pprint_actions, initialize_parser
+from records import GameRecordWriter
+from profiling import profiler, write_profile
 import argparse
+import random
+import time
 
 
 def play(args: argparse.Namespace) -> None:
+    # Seed the agents, so a recorded game can be played again with --seed
+    seed = args.seed if args.seed is not None else random.getrandbits(32)
+    random.seed(seed)
+
     # Setup game
     g_cls = globals()[args.g]
     game = g_cls(size=args.s, numwalls=args.w)
@@ -18,12 +28,20 @@ def play(args: argparse.Namespace) -> None:
     game.visualize(state)
     print()
 
-    # Initialize players
+    # Initialize players, with the game engine timed if profiling
+    if args.profile:
+        profiler.enable()
     p1_cls = globals()[args.p1]
-    p1 = p1_cls(game=game, depth=args.p1_depth, rollouts=args.p1_rollouts, player=1, policy=args.p1_policy)
+    p1 = p1_cls(game=game, depth=args.p1_depth, rollouts=args.p1_rollouts, player=1, policy=args.p1_policy, time_limit=args.p1_time_limit, workers=args.p1_workers, parallel=args.p1_parallel, batch=args.p1_batch, early_stop=args.p1_early_stop, ordering=args.p1_ordering)
 
     p2_cls = globals()[args.p2]
-    p2 = p2_cls(game=game, depth=args.p2_depth, rollouts=args.p2_rollouts, player=2, policy=args.p2_policy)
+    p2 = p2_cls(game=game, depth=args.p2_depth, rollouts=args.p2_rollouts, player=2, policy=args.p2_policy, time_limit=args.p2_time_limit, workers=args.p2_workers, parallel=args.p2_parallel, batch=args.p2_batch, early_stop=args.p2_early_stop, ordering=args.p2_ordering)
+
+    # Record the game as in experiment.py, written once it ends
+    history = []
+    writer = GameRecordWriter(args.record) if args.record else None
+    if writer:
+        writer.write({'type': 'run', 'args': vars(args), 'seed': seed, 'started': time.time()})
 
     # Begin play
     while not game.is_end(state):
@@ -31,7 +49,13 @@ def play(args: argparse.Namespace) -> None:
         # Get action from player 1
         print(f'Player 1: {args.p1}\'s turn.')
         pprint_actions(game, state)
+        if args.profile:
+            profiler.take() # Drop the calls made between moves
+        start, start_ns = time.time(), time.perf_counter_ns()
         action = p1.action(state)
+        history.append({'player': 1, 'action': action, 'time': time.time()-start, 'stats': dict(getattr(p1, 'stats', {}))})
+        if args.profile:
+            history[-1]['profile'] = profiler.move(start_ns, time.perf_counter_ns())
         print(f'Player 1: {args.p1} plays: {action}')
         print()
 
@@ -51,7 +75,13 @@ def play(args: argparse.Namespace) -> None:
         # Get action from player 2
         print(f'Player 2: {args.p2}\'s turn.')
         pprint_actions(game, state)
+        if args.profile:
+            profiler.take() # Drop the calls made between moves
+        start, start_ns = time.time(), time.perf_counter_ns()
         action = p2.action(state)
+        history.append({'player': 2, 'action': action, 'time': time.time()-start, 'stats': dict(getattr(p2, 'stats', {}))})
+        if args.profile:
+            history[-1]['profile'] = profiler.move(start_ns, time.perf_counter_ns())
         print(f'Player 2: {args.p2} plays: {action}')
         print()
 
@@ -68,6 +98,13 @@ def play(args: argparse.Namespace) -> None:
             print(f'The game has ended. {outcome}')
             break
 
+    if writer:
+        score = 1 if game.utility(state) == game.win_bonus else 0 if game.utility(state) == -game.win_bonus else 0.5
+        writer.write({'type': 'game', 'game': 0, 'seed': seed, 'first': args.p1, 'second': args.p2, 'swapped': False, 'result': score, 'moves': history})
+        writer.close()
+    if args.profile:
+        write_profile(args.profile, [(0, False, history)], args.profile_format)
+
 
 def main():
     parser = initialize_parser()
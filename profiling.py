@@ -0,0 +1,158 @@
+from agents import utils, mcts, minmax
+from games.quoridor import Quoridor
+from games.bitboard import BitboardQuoridor
+from typing import Callable, Tuple
+import functools
+import json
+import os
+import time
+
+
+# Functions timed while profiling, with the name they are reported under. They are only wrapped
+# by Profiler.enable, so runs without --profile call the originals and pay nothing for it.
+# evaluate_state is wrapped where the agents look it up as well as where it is defined.
+_TARGETS = [
+    (Quoridor, 'actions', 'actions'),
+    (Quoridor, 'successor', 'successor'),
+    (BitboardQuoridor, 'successor', 'successor'),
+    (Quoridor, '_path_exists_astar', 'path_exists'),
+    (BitboardQuoridor, '_path_exists', 'path_exists'),
+    (utils, 'evaluate_state', 'evaluate_state'),
+    (mcts, 'evaluate_state', 'evaluate_state'),
+    (minmax, 'evaluate_state', 'evaluate_state'),
+]
+
+# Per-move search stats reported by the agents: MCTS phase times in seconds and search counters
+PHASES = ['select', 'expand', 'simulate', 'backprop']
+COUNTERS = ['nodes', 'cutoffs', 'evals', 'rollouts']
+
+
+class Profiler:
+    # Counts and times the calls of the targets in this process with perf_counter_ns. Times are
+    # inclusive, path_exists runs inside actions for example. Calls made while another target is
+    # running, like the successors actions builds to test pawn moves, are also counted as nested,
+    # so count - nested is the number of calls the search made itself.
+    def __init__(self) -> None:
+        self.calls = {} # Name -> [calls, nanoseconds, nested calls] since the last take
+        self._active = [0] # Targets running at the moment
+        self._originals = []
+
+    def enabled(self) -> bool:
+        return bool(self._originals)
+
+    def enable(self) -> None:
+        if self._originals:
+            return
+        for owner, attribute, name in _TARGETS:
+            original = vars(owner)[attribute]
+            self._originals.append((owner, attribute, original))
+            setattr(owner, attribute, self._timed(original, self.calls.setdefault(name, [0, 0, 0])))
+
+    def disable(self) -> None:
+        for owner, attribute, original in reversed(self._originals):
+            setattr(owner, attribute, original)
+        self._originals = []
+
+    def _timed(self, function: Callable, counts: list[int]) -> Callable:
+        clock = time.perf_counter_ns
+        active = self._active
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            counts[2] += active[0] > 0
+            active[0] += 1
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                counts[0] += 1
+                counts[1] += clock() - start
+                active[0] -= 1
+        return timed
+
+    def take(self) -> dict:
+        # Calls since the last take as {name: {'count', 'time', 'nested'}}, with times in nanoseconds
+        taken = {name: {'count': count, 'time': total, 'nested': nested} for name, (count, total, nested) in self.calls.items() if count}
+        for counts in self.calls.values():
+            counts[0] = counts[1] = counts[2] = 0
+        return taken
+
+    def move(self, start: int, end: int) -> dict:
+        # Profile of a move that took from start to end on the perf_counter_ns clock
+        return {'start': start, 'duration': end - start, 'pid': os.getpid(), 'calls': self.take()}
+
+
+# Shared by the games played in this process
+profiler = Profiler()
+
+
+def _add(total: dict, row: dict) -> None:
+    for key, value in row.items():
+        if isinstance(value, dict):
+            _add(total.setdefault(key, {}), value)
+        else:
+            total[key] = total.get(key, 0) + value
+
+
+def _moves(swapped: bool, history: list[dict]) -> list[dict]:
+    # Profiled moves of a game, by the --p1 or --p2 agent that played them
+    moves = []
+    for move in history:
+        if 'profile' not in move:
+            continue
+        profile, stats = move['profile'], move['stats']
+        moves.append({
+            'agent': 'p2' if (move['player'] == 1) == swapped else 'p1',
+            'start': profile['start'],
+            'duration': profile['duration'],
+            'pid': profile['pid'],
+            'calls': profile['calls'],
+            'search': {counter: stats[counter] for counter in COUNTERS if counter in stats},
+            'phases': {phase: round(stats[phase] * 1e9) for phase in PHASES if phase in stats}
+        })
+    return moves
+
+
+def summarize(games: list[Tuple[int, bool, list[dict]]]) -> dict:
+    # Per move, per game and overall totals of each agent, from (index, swapped, history) of played games
+    summary = {'games': [], 'totals': {}}
+    for index, swapped, history in games:
+        moves = _moves(swapped, history)
+        totals = {}
+        for move in moves:
+            row = {'moves': 1, 'duration': move['duration'], 'calls': move['calls'], 'search': move['search'], 'phases': move['phases']}
+            _add(totals.setdefault(move['agent'], {}), row)
+            _add(summary['totals'].setdefault(move['agent'], {}), row)
+        summary['games'].append({'game': index, 'swapped': swapped, 'moves': moves, 'totals': totals})
+    return summary
+
+
+def chrome_trace(games: list[Tuple[int, bool, list[dict]]]) -> dict:
+    # Trace for chrome://tracing or Perfetto: one row per agent and process, a span per game and
+    # move, and the MCTS phase times of a move laid end to end inside it, as they are only known
+    # in total per move. Call counts and search counters are in the args of each move.
+    events = []
+    for index, swapped, history in games:
+        moves = _moves(swapped, history)
+        for number, move in enumerate(moves):
+            start = move['start'] / 1000
+            tid = 1 if move['agent'] == 'p1' else 2
+            events.append({
+                'name': f'{move["agent"]} move {number + 1}', 'cat': 'move', 'ph': 'X', 'ts': start, 'dur': move['duration'] / 1000,
+                'pid': move['pid'], 'tid': tid, 'args': {'game': index, 'calls': move['calls'], 'search': move['search']}
+            })
+            for phase, duration in move['phases'].items():
+                events.append({'name': phase, 'cat': 'mcts', 'ph': 'X', 'ts': start, 'dur': duration / 1000, 'pid': move['pid'], 'tid': tid})
+                start += duration / 1000
+        if moves:
+            start, end = moves[0]['start'], moves[-1]['start'] + moves[-1]['duration']
+            events.append({'name': f'game {index + 1}', 'cat': 'game', 'ph': 'X', 'ts': start / 1000, 'dur': (end - start) / 1000, 'pid': moves[0]['pid'], 'tid': 0, 'args': {'swapped': swapped}})
+    for pid in {event['pid'] for event in events}:
+        for tid, name in enumerate(['games', 'p1', 'p2']):
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}})
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def write_profile(path: str, games: list[Tuple[int, bool, list[dict]]], format: str = 'json') -> None:
+    with open(path, 'w') as file:
+        json.dump(chrome_trace(games) if format == 'chrome' else summarize(games), file, default=str)
@@ -0,0 +1,91 @@
+from typing import Any, Iterator, Tuple
+import json
+import os
+import zlib
+
+
+# Game records are JSON objects, one per line, each compressed as its own gzip member. The
+# file is a valid multi-member gzip file (zcat works), and a write cut short by an interrupted
+# run can only damage the last member, which the reader skips and the next writer drops.
+
+def _members(path: str, chunk_size: int = 2**16) -> Iterator[Tuple[int, bytes]]:
+    # Decompressed content of every complete gzip member, with the offset in the file where it ends
+    start, fed = 0, 0 # Start of the current member and how many of its bytes were decompressed so far
+    decompressor = zlib.decompressobj(31)
+    data = b''
+    with open(path, 'rb') as file:
+        while chunk := file.read(chunk_size):
+            while chunk:
+                fed += len(chunk)
+                try:
+                    data += decompressor.decompress(chunk)
+                except zlib.error:
+                    return
+                if not decompressor.eof:
+                    break
+                chunk = decompressor.unused_data
+                start, fed = start + fed - len(chunk), 0
+                yield start, data
+                decompressor = zlib.decompressobj(31)
+                data = b''
+
+
+def read_records(path: str) -> Iterator[dict]:
+    # Streams the records back one at a time, without loading the whole file
+    for _, data in _members(path):
+        yield json.loads(data)
+
+
+class GameRecordWriter:
+    # Appends records to path and flushes after each one, so every record written before an
+    # interruption can be read back. Values JSON cannot hold, like numpy numbers, are written with str.
+    def __init__(self, path: str) -> None:
+        end = 0
+        if os.path.exists(path):
+            for end, _ in _members(path):
+                pass
+            if not _partial_member(path, end):
+                raise ValueError(f'{path} is not a game record file, or is damaged before its last record.')
+        self.path = path
+        self.file = open(path, 'ab')
+        self.file.truncate(end) # Drop a record left incomplete by an interrupted run
+        self.records = 0
+
+    def write(self, record: dict) -> None:
+        compressor = zlib.compressobj(wbits=31)
+        line = json.dumps(record, default=_to_json).encode() + b'\n'
+        self.file.write(compressor.compress(line) + compressor.flush())
+        self.file.flush()
+        self.records += 1
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self) -> 'GameRecordWriter':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def _partial_member(path: str, start: int) -> bool:
+    # Whether the bytes from start to the end of the file are nothing or the beginning of a gzip member
+    with open(path, 'rb') as file:
+        file.seek(start)
+        tail = file.read()
+    if not tail:
+        return True
+    if tail[:2] != b'\x1f\x8b'[:len(tail)]:
+        return False
+    decompressor = zlib.decompressobj(31)
+    try:
+        decompressor.decompress(tail)
+    except zlib.error:
+        return False
+    return not decompressor.eof
+
+
+def _to_json(value: Any) -> Any:
+    if hasattr(value, 'item'): # numpy scalars
+        return value.item()
+    return str(value)
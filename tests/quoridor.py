@@ -1,7 +1,28 @@
 from games.quoridor import State as QuoridorState
 from games.quoridor import Quoridor
+from games.bitboard import BitboardQuoridor
 from agents.random import RandomAgent
-from agents.minmax import QuoridorAlphaBetaAgent
+from agents.minmax import QuoridorAlphaBetaAgent, QuoridorParallelAlphaBetaAgent
+from games.batch import BatchQuoridor
+from agents.mcts import Node, QuoridorMCTSAgent, QuoridorTreeParallelMCTSAgent
+from agents.array_mcts import ArrayTree, QuoridorArrayMCTSAgent
+from agents.utils import DistanceOracle
+from records import GameRecordWriter, read_records
+from match import Match, match_parser, match_seed, elo, expected_score, sprt_bounds, sprt_llr
+from experiment import evaluate, play_game, play_trial
+from utils import initialize_parser
+from games.tictactoe import TicTacToe
+from profiling import Profiler, summarize, chrome_trace
+from dataclasses import replace
+from collections import Counter
+import contextlib
+import io
+import math
+import tempfile
+import os
+import numpy as np
+import random
+import time
 
 
 def test_game_state():
@@ -113,7 +134,429 @@ def test_agents():
     if chosen_action not in possible_actions:
         print('The MiniMax agent did not return a legal action.')    
 
+    # Does the MiniMax agent with a transposition table keep its entries across moves?
+    game = BitboardQuoridor(size=5, numwalls=5)
+    state = game.start_state()
+    minimax_agent = QuoridorAlphaBetaAgent(game=game, depth=2, tt_size=2**12)
+    chosen_action = minimax_agent.action(state)
+    if chosen_action not in game.actions(state):
+        print('The MiniMax agent with a transposition table did not return a legal action.')
+    stores = minimax_agent.tt.stores
+    minimax_agent.action(state)
+    if minimax_agent.tt.hits == 0 or minimax_agent.tt.stores != stores:
+        print('The transposition table was not reused on the second search of the same position.')
+
+    # Does move ordering leave the value of the search unchanged?
+    game = BitboardQuoridor(size=5, numwalls=5)
+    state = game.successor(game.start_state(), ('h_wall', (1, 2)))
+    values = [QuoridorAlphaBetaAgent(game=game, depth=3, player=2, ordering=ordering).search(state, 3) for ordering in [False, True]]
+    if values[0] != values[1]:
+        print(f'Move ordering changed the value of a depth 3 search: {values}.')
+
+    # Does the MiniMax agent with a time limit deepen within its budget?
+    game = BitboardQuoridor(size=9, numwalls=10)
+    state = game.start_state()
+    minimax_agent = QuoridorAlphaBetaAgent(game=game, depth=10, time_limit=0.3)
+    start = time.perf_counter()
+    chosen_action = minimax_agent.action(state)
+    elapsed = time.perf_counter() - start
+    if chosen_action not in game.actions(state):
+        print('The MiniMax agent with a time limit did not return a legal action.')
+    if elapsed > 0.6 or minimax_agent.stats['depth'] < 1:
+        print(f'The MiniMax agent with a time limit took {elapsed:.2f} seconds: {minimax_agent.stats}.')
+
+    # If not even the depth 1 search finishes, is the best root move seen so far played?
+    class SlowAgent(QuoridorAlphaBetaAgent):
+        def eval(self, state, player):
+            time.sleep(0.005)
+            return super().eval(state, player)
+    minimax_agent = SlowAgent(game=game, depth=3, time_limit=0.05)
+    chosen_action = minimax_agent.action(state)
+    if minimax_agent.stats['depth'] != 0 or minimax_agent._root_best is None or chosen_action != minimax_agent._root_best:
+        print(f'The MiniMax agent did not fall back to its best root move after a timeout: {minimax_agent.stats}.')
+    if chosen_action not in game.actions(state):
+        print('The MiniMax agent did not return a legal action after a timeout.')
+
+    # Does the parallel MiniMax agent pick the same move as the serial one?
+    game = BitboardQuoridor(size=5, numwalls=5)
+    state = game.successor(game.start_state(), ('h_wall', (1, 2)))
+    serial_agent = QuoridorAlphaBetaAgent(game=game, depth=2, player=2)
+    parallel_agent = QuoridorParallelAlphaBetaAgent(game=game, depth=2, player=2, workers=2)
+    if parallel_agent.action(state) != serial_agent.action(state):
+        print('The parallel MiniMax agent did not return the same move as the serial MiniMax agent.')
+    parallel_agent.close()
+
+    # Does the MCTS agent carry its tree over to the next move?
+    game = BitboardQuoridor(size=5, numwalls=5)
+    state = game.start_state()
+    mcts_agent = QuoridorMCTSAgent(game=game, rollouts=200, depth=10)
+    state = game.successor(state, mcts_agent.action(state))
+    state = game.successor(state, game.actions(state)[0])
+    chosen_action = mcts_agent.action(state)
+    if chosen_action not in game.actions(state):
+        print('The MCTS agent did not return a legal action after reusing its tree.')
+    if mcts_agent.tree_hits != 1 or mcts_agent.stats['reused_visits'] == 0:
+        print('The MCTS agent did not reuse the subtree of the opponent\'s reply.')
+
+    # Does the MCTS agent with a time limit stay within its budget?
+    mcts_agent = QuoridorMCTSAgent(game=game, depth=10, time_limit=0.2)
+    chosen_action = mcts_agent.action(state)
+    if chosen_action not in game.actions(state):
+        print('The MCTS agent with a time limit did not return a legal action.')
+    if mcts_agent.stats['time'] > 0.5 or mcts_agent.stats['rollouts'] == 0:
+        print(f'The MCTS agent did not respect its time limit: {mcts_agent.stats}.')
+
+    # Does the MCTS agent expand at most one child per rollout?
+    mcts_agent = QuoridorMCTSAgent(game=game, rollouts=100, depth=10, early_stop=False)
+    mcts_agent.action(game.start_state())
+    if mcts_agent.stats['tree_size'] > 101:
+        print(f'The MCTS agent expanded {mcts_agent.stats["tree_size"]} nodes in 100 rollouts.')
+
+    # Does the MCTS agent play all its rollouts unless early stopping is asked for?
+    mcts_agent = QuoridorMCTSAgent(game=game, rollouts=300, depth=10)
+    mcts_agent.action(game.start_state())
+    if mcts_agent.stats['rollouts'] != 300:
+        print(f'The MCTS agent stopped after {mcts_agent.stats["rollouts"]} of its 300 rollouts without early stopping.')
+
+    # Do batched MCTS agents simulate distinct leaves, and take back every virtual loss?
+    for agent_cls in [QuoridorMCTSAgent, QuoridorArrayMCTSAgent]:
+        for rollouts in [8, 64]:
+            mcts_agent = agent_cls(game=game, rollouts=rollouts, depth=10, batch=8)
+            mcts_agent.virtual_loss = 100 # Any loss left in the tree outweighs the playout values
+            tree = mcts_agent.search(game.start_state(), rollouts)
+            visits = [N for _, N in mcts_agent.root_visits(tree)]
+            if mcts_agent.stats['rollouts'] != rollouts or sum(visits) != rollouts:
+                print(f'The batched {agent_cls.__name__} counted {sum(visits)} root visits in {rollouts} rollouts.')
+            if rollouts == 8 and sorted(visits, reverse=True)[:9] != [1] * 8 + [0]:
+                print(f'The batched {agent_cls.__name__} simulated the same leaf twice in one batch: {visits}.')
+            U = tree.U[0] if agent_cls is QuoridorArrayMCTSAgent else tree.U
+            if abs(U) > rollouts:
+                print(f'The batched {agent_cls.__name__} left virtual losses in its tree.')
+
+    # Does the tree-parallel MCTS agent spread its nodes over the lock stripes?
+    mcts_agent = QuoridorTreeParallelMCTSAgent(game=game, rollouts=100, depth=10, workers=2)
+    nodes = [Node(state=None) for _ in range(1000)]
+    stripes = {id(mcts_agent._lock(n)) for n in nodes}
+    if len(stripes) < len(mcts_agent._locks) // 2:
+        print(f'The tree-parallel MCTS agent only uses {len(stripes)} of its {len(mcts_agent._locks)} lock stripes.')
+    if mcts_agent.action(state) not in game.actions(state):
+        print('The tree-parallel MCTS agent did not return a legal action.')
+
+
+def test_array_tree():
+    # Do the array buffers grow when full and keep the nodes already stored?
+    game = BitboardQuoridor(size=5, numwalls=5)
+    state = game.start_state()
+    tree = ArrayTree(state, capacity=4)
+    tree.add_children(0, game.actions(state)[:3])
+    tree.backprop(1, 2)
+    tree.add_children(2, game.actions(state))
+    if tree.size != 4 + len(game.actions(state)) or len(tree.U) < tree.size or len(tree.states) != len(tree.U):
+        print(f'The array tree did not grow its buffers: {tree.size} nodes in buffers of {len(tree.U)}.')
+    if tree.N[2] != 1 or tree.N[0] != 1 or tree.U[0] != -1 or list(tree.parent[tree.children(2)]) != [2] * tree.num_children[2]:
+        print('The array tree lost its statistics or parents when its buffers grew.')
+
+    # Does the array MCTS agent return a legal action, with a tree that agrees with its stats?
+    for rollouts in [50, 200]:
+        agent = QuoridorArrayMCTSAgent(game=game, rollouts=rollouts, depth=10, early_stop=False)
+        tree = agent.search(state, rollouts)
+        action, _ = max(agent.root_visits(tree), key=lambda visit: visit[1])
+        if action not in game.actions(state):
+            print('The array MCTS agent did not return a legal action.')
+        expanded = [node for node in range(tree.size) if tree.num_children[node] > 0]
+        if agent.tree_size(tree) != 1 + sum(int(tree.num_children[node]) for node in expanded) or agent.stats['tree_size'] != tree.size:
+            print(f'The array MCTS tree size {tree.size} does not match its children.')
+        if sum(N for _, N in agent.root_visits(tree)) != tree.N[0] or tree.N[0] != rollouts:
+            print(f'The root visits of the array MCTS agent do not add up to its {rollouts} rollouts.')
+        if agent.action(state) not in game.actions(state):
+            print('The array MCTS agent did not return a legal action.')
+
+
+def test_distance_oracle():
+    # Does the oracle find the shortest paths to the goal rows and reuse its maps for the same walls?
+    game = Quoridor(size=5, numwalls=3)
+    oracle = DistanceOracle(capacity=2)
+    state = QuoridorState(
+        p1=(2, 2), 
+        p2=(2, 3), 
+        p1_numwalls=0, 
+        p2_numwalls=0,
+        player=1,
+        h_walls=frozenset([(1, 1), (2, 0)]),
+        v_walls=frozenset([(1, 2), (3, 3), (2, 2)])
+    )
+    if oracle.distances(game, state) != (2, 7):
+        print(f'The distance oracle returned the wrong distances: {oracle.distances(game, state)}.')
+    oracle.distances(game, replace(state, p1=(0, 0), p2=(4, 4)))
+    if oracle.hits != 1 or len(oracle.maps) != 1:
+        print('The distance oracle did not reuse the distance maps of the same walls.')
+
+    # Is a player that is cut off from its goal row infinitely far away, and does the cache stay bounded?
+    game = Quoridor(size=3, numwalls=3)
+    for h_walls in [frozenset([(0, 0)]), frozenset([(1, 1)]), frozenset([(0, 1)])]:
+        state = QuoridorState(p1=(0, 0), p2=(1, 2), p1_numwalls=0, p2_numwalls=0, player=1, h_walls=h_walls, v_walls=frozenset([(1, 0)]))
+        oracle.distances(game, state)
+    if oracle.distances(game, state)[0] != float('inf'):
+        print('The distance oracle did not notice that player 1 is cut off from its goal row.')
+    if len(oracle.maps) > 2:
+        print(f'The distance oracle holds {len(oracle.maps)} maps with a capacity of 2.')
+
+
+def test_grid_graph():
+    # Are the legal walls exactly those that leave both players a path, found by stepping around the walls themselves?
+    def reaches(game, start, goal, h_walls, v_walls):
+        reached, frontier = {start}, [start]
+        while frontier:
+            node = frontier.pop()
+            for direction in game.directions:
+                s = (node[0]+direction[0], node[1]+direction[1])
+                if game._in_bounds(s) and s not in reached and not game._is_blocked(node, s, h_walls, v_walls):
+                    reached.add(s)
+                    frontier.append(s)
+        return any(node[1] == goal for node in reached)
+
+    for size, numwalls in [(3, 3), (5, 5), (7, 6)]:
+        game = Quoridor(size=size, numwalls=numwalls)
+        for seed in range(3):
+            rng = random.Random(seed)
+            state = game.start_state()
+            while not game.is_end(state):
+                actions = game.actions(state)
+                expected = [('pawn', move) for move in game._get_pawn_moves(state)]
+                if state.p1_numwalls if state.player == 1 else state.p2_numwalls:
+                    for move_type in ['h_wall', 'v_wall']:
+                        for candidate in game.wall_placement_candidates:
+                            if (move_type, candidate) in game._blocked_slots(state):
+                                continue
+                            h_walls = state.h_walls | {candidate} if move_type == 'h_wall' else state.h_walls
+                            v_walls = state.v_walls | {candidate} if move_type == 'v_wall' else state.v_walls
+                            if reaches(game, state.p1, size-1, h_walls, v_walls) and reaches(game, state.p2, 0, h_walls, v_walls):
+                                expected.append((move_type, candidate))
+                if actions != expected:
+                    print(f'The legal actions on a {size}x{size} board changed for {state}.')
+                    break
+                hand_built = QuoridorState(state.p1, state.p2, state.p1_numwalls, state.p2_numwalls, state.player, state.h_walls, state.v_walls)
+                if game._adjacency(hand_built) != state.adjacency:
+                    print(f'The adjacency was not updated correctly for {state}.')
+                state = game.successor(state, rng.choice(actions))
+
+
+def test_bitboard_engine():
+    # Does the bitboard engine generate the same actions and successors as the reference engine?
+    for size, numwalls in [(3, 3), (5, 5), (9, 10)]:
+        game = Quoridor(size=size, numwalls=numwalls)
+        bitboard_game = BitboardQuoridor(size=size, numwalls=numwalls)
+        for seed in range(5):
+            rng = random.Random(seed)
+            state = game.start_state()
+            bitboard_state = bitboard_game.start_state()
+            while not game.is_end(state):
+                actions = game.actions(state)
+                if actions != bitboard_game.actions(bitboard_state):
+                    print(f'The bitboard engine generated different actions on a {size}x{size} board for {state}.')
+                    break
+                if bitboard_game.to_state(bitboard_state) != state or bitboard_game.from_state(state) != bitboard_state:
+                    print(f'The bitboard state does not round trip for {state}.')
+                packed = game.pack(state)
+                if game.unpack(packed) != state or bitboard_game.unpack(packed) != bitboard_state or bitboard_game.pack(bitboard_state) != packed:
+                    print(f'The packed state does not round trip for {state}.')
+                if hash(packed) != hash(game.pack(game.unpack(packed))):
+                    print(f'The packed state changed its hash after a round trip for {state}.')
+                for sampled in [game.random_action(state, rng=rng), bitboard_game.random_action(bitboard_state, rng=rng)]:
+                    if sampled not in actions:
+                        print(f'An illegal action {sampled} was sampled for {state}.')
+                action = rng.choice(actions)
+                if game.pack(game.successor(state, action)) == packed:
+                    print(f'The packed state did not change after {action} in {state}.')
+                state = game.successor(state, action)
+                bitboard_state = bitboard_game.successor(bitboard_state, action)
+            if bitboard_game.is_end(bitboard_state) != game.is_end(state):
+                print('The bitboard engine did not detect the end of the game.')
+
+
+def test_batch_engine():
+    # Does the batch engine agree with the reference engine on pawn moves, distances and wall legality?
+    for size, numwalls in [(3, 3), (5, 5)]:
+        game = Quoridor(size=size, numwalls=numwalls)
+        batch_game = BatchQuoridor(game)
+        walls = [('h_wall', wall) for wall in game.wall_placement_candidates]
+        walls += [('v_wall', wall) for wall in game.wall_placement_candidates]
+        for seed in range(3):
+            rng = random.Random(seed)
+            state = game.start_state()
+            while not game.is_end(state):
+                actions = game.actions(state)
+                batch = batch_game.from_states([state])
+                mask = batch_game.pawn_moves(batch, np.arange(1))[0]
+                pawn_moves = [move for move, legal in zip(batch_game.moves, mask) if legal]
+                if sorted(pawn_moves) != sorted(move for typ, move in actions if typ == 'pawn'):
+                    print(f'The batch engine generated different pawn moves on a {size}x{size} board for {state}.')
+
+                distances = batch_game.distances(batch.blocked)[0]
+                for player, pawn in enumerate([state.p1, state.p2]):
+                    if distances[player, pawn[1] * size + pawn[0]] != game.goal_distances(state, player + 1)[pawn]:
+                        print(f'The batch engine computed a different goal distance for player {player + 1} for {state}.')
+
+                if state.p1_numwalls if state.player == 1 else state.p2_numwalls:
+                    batch = batch_game.from_states([state] * len(walls))
+                    indices = np.array([batch_game._wall_index(*wall) for wall in walls])
+                    legal = batch_game._place_walls(batch, np.arange(len(walls)), indices)
+                    if [wall for wall, ok in zip(walls, legal) if ok] != [action for action in actions if action[0] != 'pawn']:
+                        print(f'The batch engine allowed different walls on a {size}x{size} board for {state}.')
+                state = game.successor(state, rng.choice(actions))
+
+    # Do batch rollouts return one value in [-1, 1] per state?
+    game = BitboardQuoridor(size=5, numwalls=5)
+    values = BatchQuoridor(game).simulate([game.start_state()] * 8, 10, 'forward_or_random', QuoridorMCTSAgent.weights, np.random.default_rng(0))
+    if len(values) != 8 or np.abs(values).max() > 1:
+        print(f'The batch engine returned unexpected rollout values: {values}.')
+
+
+    # With most wall slots taken, are moves still uniform over the legal actions, whether or not the
+    # wall draws run out?
+    game = BitboardQuoridor(size=5, numwalls=10)
+    state = game.start_state()
+    rng = random.Random(3)
+    for _ in range(8):
+        state = game.successor(state, rng.choice([action for action in game.actions(state) if action[0] != 'pawn']))
+    actions = game.actions(state)
+    for max_draws in [8, 0]:
+        batch_game = BatchQuoridor(game, max_draws=max_draws)
+        batch = batch_game.from_states([state] * 6000)
+        batch_game.step(batch, np.arange(6000), np.random.default_rng(0))
+        counts = Counter(batch.pawns[i].tobytes() + batch.blocked[i].tobytes() for i in range(6000))
+        expected = 6000 / len(actions)
+        if len(counts) != len(actions) or max(abs(count - expected) for count in counts.values()) > 5 * math.sqrt(expected):
+            print(f'The batch engine did not draw its moves uniformly with {max_draws} wall draws: {sorted(counts.values())}.')
+
+def test_game_records():
+    # Do records survive an interrupted write, and can the next run keep appending to the file?
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'games.jsonl.gz')
+        records = [{'type': 'game', 'game': i, 'moves': [{'player': 1, 'action': ('pawn', (0, 1)), 'time': 0.5}]} for i in range(3)]
+        with GameRecordWriter(path) as writer:
+            for record in records[:2]:
+                writer.write(record)
+        with open(path, 'ab') as file:
+            file.write(open(path, 'rb').read()[:20]) # A record cut short
+        if [record['game'] for record in read_records(path)] != [0, 1]:
+            print('The records written before an interruption could not be read back.')
+        with GameRecordWriter(path) as writer:
+            writer.write(records[2])
+        read = list(read_records(path))
+        if [record['game'] for record in read] != [0, 1, 2] or read[2]['moves'][0]['action'] != ['pawn', [0, 1]]:
+            print(f'The records were not appended after an interrupted write: {read}.')
+
+        # Files that are not records are refused rather than emptied
+        other = os.path.join(directory, 'results.json')
+        with open(other, 'w') as file:
+            file.write('{"p1_wins": 10}')
+        try:
+            GameRecordWriter(other)
+            print('A file that is not a game record file was opened for writing.')
+        except ValueError:
+            pass
+        if open(other).read() != '{"p1_wins": 10}':
+            print('A file that is not a game record file was changed.')
+
+
+def test_resume():
+    # Does a run resumed from its checkpoint play the same games as one that was never interrupted?
+    with tempfile.TemporaryDirectory() as directory:
+        def run(name: str, trials: int, *flags: str) -> list:
+            argv = ['--g', 'BitboardQuoridor', '--p1', 'QuoridorMCTSAgent', '--p1_rollouts', '20', '--p1_depth', '10', '--p2', 'RandomAgent',
+                    '--alternate', '--seed', '7', '--verbose', '', '--trials', str(trials),
+                    '--checkpoint', os.path.join(directory, f'{name}.json'), '--record', os.path.join(directory, f'{name}.jsonl.gz'), *flags]
+            with contextlib.redirect_stdout(io.StringIO()):
+                evaluate(initialize_parser().parse_args(argv))
+            games = [record for record in read_records(os.path.join(directory, f'{name}.jsonl.gz')) if record['type'] == 'game']
+            return sorted((record['game'], record['swapped'], record['result'], [move['action'] for move in record['moves']]) for record in games)
+
+        straight = run('straight', 6)
+        run('resumed', 3)
+        checkpoint = os.path.join(directory, 'resumed.json')
+        with open(checkpoint) as file:
+            stale = file.read()
+        resumed = run('resumed', 6, '--resume', '--jobs', '2')
+        if resumed != straight:
+            print('The resumed run did not play the same games as the uninterrupted run.')
+
+        # Games recorded after the last checkpoint are played again on resume, but not recorded twice
+        with open(checkpoint, 'w') as file:
+            file.write(stale)
+        if run('resumed', 6, '--resume') != straight:
+            print('A game played again on resume was recorded twice.')
+        try:
+            run('resumed', 8, '--resume', '--p1_rollouts', '30')
+            print('A run was resumed from a checkpoint saved with other player settings.')
+        except ValueError:
+            pass
+
+
+def test_sprt():
+    # Do the Elo estimate and the SPRT agree with known values, and decide in the right direction?
+    if abs(elo(0.75) - 190.85) > 0.01 or abs(expected_score(elo(0.3)) - 0.3) > 1e-9:
+        print(f'A 75% score should be about 190.85 Elo, not {elo(0.75)}.')
+    lower, upper = sprt_bounds(0.05, 0.05)
+    if abs(lower + 2.944) > 0.001 or abs(upper - 2.944) > 0.001:
+        print(f'The SPRT bounds for alpha = beta = 0.05 should be about +/-2.944, not {lower, upper}.')
+    if not sprt_llr(120, 20, 60, 0, 50) > upper:
+        print(f'A 65% score over 200 games should accept elo1 = 50, LLR was {sprt_llr(120, 20, 60, 0, 50)}.')
+    if not sprt_llr(180, 40, 180, 0, 50) < lower:
+        print(f'An even score over 400 games should accept elo0 = 0, LLR was {sprt_llr(180, 40, 180, 0, 50)}.')
+    if not lower < sprt_llr(10, 0, 0, 0, 50) < sprt_llr(20, 0, 0, 0, 50):
+        print('A streak of wins should count towards elo1.')
+
+    # Perfect TicTacToe play is a draw, whichever side moves first
+    args = match_parser().parse_args(['--g', 'TicTacToe', '--p1', 'AlphaBetaAgent', '--p1_depth', '9', '--p2', 'AlphaBetaAgent', '--p2_depth', '9'])
+    match = Match('draws', args)
+    for index in range(2):
+        match.add(play_trial(args, TicTacToe(), index, 0, alternate=True)[2])
+    if (match.wins, match.draws, match.losses) != (0, 2, 0):
+        print(f'Two perfect TicTacToe games should be drawn, not +{match.wins} ={match.draws} -{match.losses}.')
+
+    # Do results count in the order the games were handed out, whatever order they end in?
+    match = Match('order', args)
+    counted = [[index for index, *_ in match.finish((index, False, score, 0, [], [], []))] for index, score in [(1, 0), (2, 1), (0, 1)]]
+    if counted != [[], [], [0, 1, 2]] or (match.wins, match.losses) != (2, 1):
+        print(f'Match results were not counted in the order of the games: {counted}.')
+    if match_seed(0, match) == match_seed(0, Match('other', args)):
+        print('Two matches of a gauntlet share their game seeds.')
+
+
+def test_profiler():
+    # Are the engine calls of each move counted while enabled, and the originals back once disabled?
+    actions = Quoridor.actions
+    profiler = Profiler()
+    profiler.enable()
+    game = Quoridor(size=5, numwalls=3)
+    random.seed(0)
+    _, _, _, _, history = play_game(game, QuoridorAlphaBetaAgent(game=game, depth=1, player=1), RandomAgent(game=game, player=2), profiler)
+    profiler.disable()
+    if Quoridor.actions is not actions:
+        print('Disabling the profiler did not restore Quoridor.actions.')
+    move = history[0]['profile']
+    if move['calls'].get('actions', {}).get('count') != 1 or move['calls']['evaluate_state']['count'] != history[0]['stats']['evals']:
+        print(f'The first alpha-beta move should call actions once and evaluate_state once per leaf: {move["calls"]}.')
+    if move['calls']['actions']['nested'] != 0 or move['calls']['path_exists']['nested'] != move['calls']['path_exists']['count']:
+        print(f'Only the path checks inside actions should count as nested calls: {move["calls"]}.')
+    totals = summarize([(0, True, history)])['totals']
+    if totals['p2']['moves'] != len(history[::2]) or totals['p2']['search']['nodes'] != sum(entry['stats']['nodes'] for entry in history[::2]):
+        print(f'The totals of the agent that moved first with swapped colors are off: {totals}.')
+    spans = [event for event in chrome_trace([(0, False, history)])['traceEvents'] if event['ph'] == 'X']
+    if len(spans) != len(history) + 1:
+        print(f'The trace should have a span per move and one for the game, not {len(spans)}.')
+
 
 if __name__ == '__main__':
     test_game_state()
-    test_agents()
\ No newline at end of file
+    test_agents()
+    test_array_tree()
+    test_distance_oracle()
+    test_grid_graph()
+    test_bitboard_engine()
+    test_batch_engine()
+    test_game_records()
+    test_resume()
+    test_sprt()
+    test_profiler()
\ No newline at end of file
@@ -8,19 +8,19 @@ def initialize_parser() -> argparse.ArgumentParser:
     # Add game choice arguments
     parser.add_argument('--g', type=str,
                         help='Choice of game.',
-                        choices=['Quoridor', 'TicTacToe'],
+                        choices=['Quoridor', 'BitboardQuoridor', 'TicTacToe'],
                         default='Quoridor'
     )
 
     # Add player choice arguments
     parser.add_argument('--p1', type=str, 
                         help='Choice of player 1.', 
-                        choices=['RandomAgent', 'HumanAgent', 'MCTSAgent', 'QuoridorMCTSAgent', 'AlphaBetaAgent', 'QuoridorAlphaBetaAgent'],
+                        choices=['RandomAgent', 'HumanAgent', 'MCTSAgent', 'QuoridorMCTSAgent', 'AlphaBetaAgent', 'QuoridorAlphaBetaAgent', 'ParallelAlphaBetaAgent', 'QuoridorParallelAlphaBetaAgent', 'TreeParallelMCTSAgent', 'QuoridorTreeParallelMCTSAgent', 'ArrayMCTSAgent', 'QuoridorArrayMCTSAgent'],
                         default='MCTSAgent'
     )
     parser.add_argument('--p2', type=str, 
                         help='Choice of player 2.', 
-                        choices=['RandomAgent', 'HumanAgent', 'MCTSAgent', 'QuoridorMCTSAgent', 'AlphaBetaAgent', 'QuoridorAlphaBetaAgent'],
+                        choices=['RandomAgent', 'HumanAgent', 'MCTSAgent', 'QuoridorMCTSAgent', 'AlphaBetaAgent', 'QuoridorAlphaBetaAgent', 'ParallelAlphaBetaAgent', 'QuoridorParallelAlphaBetaAgent', 'TreeParallelMCTSAgent', 'QuoridorTreeParallelMCTSAgent', 'ArrayMCTSAgent', 'QuoridorArrayMCTSAgent'],
                         default='RandomAgent'
     )
 
@@ -41,6 +41,52 @@ def initialize_parser() -> argparse.ArgumentParser:
                         help='Number of rollouts for MCTS. Only applicable if player is an MCTSAgent.',
                         default=100
     )
+    parser.add_argument('--p1_time_limit', type=float,
+                        help='Seconds per move. Alpha-beta agents deepen iteratively until the limit, up to their depth. MCTS agents run rollouts until the limit.',
+                        default=None
+    )
+    parser.add_argument('--p2_time_limit', type=float,
+                        help='Seconds per move. Alpha-beta agents deepen iteratively until the limit, up to their depth. MCTS agents run rollouts until the limit.',
+                        default=None
+    )
+    parser.add_argument('--p1_workers', type=int,
+                        help='Number of worker processes (threads for tree-parallel MCTS). Only applicable if player is a parallel agent.',
+                        default=None
+    )
+    parser.add_argument('--p2_workers', type=int,
+                        help='Number of worker processes (threads for tree-parallel MCTS). Only applicable if player is a parallel agent.',
+                        default=None
+    )
+    parser.add_argument('--p1_parallel', type=str,
+                        help='Parallel mode for MCTS agents: independent trees per worker (root) or parallel playouts per leaf (leaf).',
+                        choices=['root', 'leaf'],
+                        default=None
+    )
+    parser.add_argument('--p2_parallel', type=str,
+                        help='Parallel mode for MCTS agents: independent trees per worker (root) or parallel playouts per leaf (leaf).',
+                        choices=['root', 'leaf'],
+                        default=None
+    )
+    parser.add_argument('--p1_batch', type=int,
+                        help='Distinct leaves selected per MCTS iteration, their playouts run together on NumPy arrays for Quoridor.',
+                        default=None
+    )
+    parser.add_argument('--p2_batch', type=int,
+                        help='Distinct leaves selected per MCTS iteration, their playouts run together on NumPy arrays for Quoridor.',
+                        default=None
+    )
+    parser.add_argument('--p1_early_stop', action='store_true',
+                        help='Stop MCTS searches once the most visited move can no longer be overtaken.'
+    )
+    parser.add_argument('--p2_early_stop', action='store_true',
+                        help='Stop MCTS searches once the most visited move can no longer be overtaken.'
+    )
+    parser.add_argument('--p1_ordering', action='store_true',
+                        help='Order moves in alpha-beta search (table and principal variation moves, killers, history). Ties between equal moves may then be broken differently.'
+    )
+    parser.add_argument('--p2_ordering', action='store_true',
+                        help='Order moves in alpha-beta search (table and principal variation moves, killers, history). Ties between equal moves may then be broken differently.'
+    )
     parser.add_argument('--p1_policy', type=str, 
                         help='Policy for MCTS agent playouts.',
                         choices=['random', 'random_pmove', 'forward_or_random', 'forward_or_random_pmove'],
@@ -68,6 +114,41 @@ def initialize_parser() -> argparse.ArgumentParser:
                         help='Number of trials.',
                         default=10
     )
+    parser.add_argument('--jobs', type=int,
+                        help='Processes to spread the trials over.',
+                        default=1
+    )
+    parser.add_argument('--alternate', action='store_true',
+                        help='Let player 2 move first in every other game.'
+    )
+    parser.add_argument('--seed', type=int,
+                        help='Seed for the random number generators, tournament games derive their own seed from it.',
+                        default=None
+    )
+    parser.add_argument('--record', type=str,
+                        help='File to append a compressed JSON record of every game to, read it back with records.read_records.',
+                        default=None
+    )
+    parser.add_argument('--checkpoint', type=str,
+                        help='File to save the seed and the results of the completed games to, for --resume.',
+                        default=None
+    )
+    parser.add_argument('--checkpoint_every', type=int,
+                        help='Number of completed games between checkpoints.',
+                        default=1
+    )
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue the run saved in --checkpoint, skipping the games it already completed.'
+    )
+    parser.add_argument('--profile', type=str,
+                        help='File to write the time spent in the game engine and in each search phase per move to, see profiling.py.',
+                        default=None
+    )
+    parser.add_argument('--profile_format', type=str,
+                        help='Format of the --profile file: totals per move, game and agent (json) or a trace for chrome://tracing (chrome).',
+                        choices=['json', 'chrome'],
+                        default='json'
+    )
     parser.add_argument('--verbose', type=bool,
                         help='Flag to turn on or off printing of per game outcome data.',
                         default=True